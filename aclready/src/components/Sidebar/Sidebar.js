@@ -24,8 +24,11 @@ export default function Sidebar() {
   };
 
   const handleFileUpload = async (file) => {
+    // Lets the server tell this upload's progress apart from other users' uploads
+    const uploadId = Date.now().toString(36) + Math.random().toString(36).slice(2);
     const formData = new FormData();
     formData.append('file', file);
+    formData.append('upload_id', uploadId);
 
     try {
       dispatch({
@@ -48,7 +51,7 @@ export default function Sidebar() {
       })
       setLoadingStage("Loading...");
 
-      const eventSource = new EventSource('http://localhost:8080/api/upload/status');
+      const eventSource = new EventSource(`http://localhost:8080/api/upload/status?upload_id=${uploadId}`);
 
       eventSource.onmessage = function(event) {
         setLoadingStage(event.data);
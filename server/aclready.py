@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Command line interface of ACLReady.
+
+    python aclready.py batch submissions/ --output results.jsonl
+    python aclready.py batch manifest.txt --output results.jsonl --workers 8 --mode grouped
+    python aclready.py batch submissions/ --output results-llama.jsonl --llm local
+"""
+
+import argparse
+import logging
+import sys
+
+from batch import run_batch
+from config import BATCH_WORKERS, INFERENCE_MODE, LLM_BACKEND, MAX_CONCURRENT_QUERIES, QUERY_TIMEOUT
+from llm_backends import BACKENDS
+from process_file import INFERENCE_MODES
+
+def batch_command(args):
+    try:
+        done, failed, skipped = run_batch(args.source, args.output, args.workers, args.mode, args.concurrency, args.timeout,
+                                          args.llm)
+    except KeyboardInterrupt:
+        return 130
+    print(f"{done} done, {failed} failed, {skipped} skipped (already in {args.output})")
+    return 1 if failed else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='ACLReady: fill the ACL Responsible NLP Research checklist from LaTeX sources.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help='Process a directory or manifest of submissions into a JSONL file',
+                                description='Process every .tex, .zip and .tar.gz submission in a directory (or listed in a '
+                                            'manifest file, one path per line) and append one JSON line per paper to the '
+                                            'output as it finishes. Papers already in the output are skipped, so an '
+                                            'interrupted run resumes where it stopped.')
+    batch.add_argument('source', help='Directory of submissions, or a manifest file listing them')
+    batch.add_argument('--output', '-o', required=True, help='JSONL file the results are appended to')
+    batch.add_argument('--workers', type=int, default=BATCH_WORKERS, help='Papers processed at the same time (worker processes)')
+    batch.add_argument('--mode', choices=INFERENCE_MODES, default=INFERENCE_MODE, help='Inference mode')
+    batch.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_QUERIES,
+                       help='Checklist questions of one paper answered at the same time')
+    batch.add_argument('--timeout', type=float, default=QUERY_TIMEOUT, help='Seconds per question before it is reported as failed')
+    batch.add_argument('--llm', choices=sorted(BACKENDS), default=LLM_BACKEND, help='LLM backend answering the questions')
+    batch.set_defaults(handler=batch_command)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    sys.exit(args.handler(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Reading checklist answers out of LLM responses.
+
+Responses are parsed tolerantly (code fences, text around the JSON object, LaTeX backslashes, trailing commas,
+Python-style quoting) and then validated: 'answer' must be one of ANSWERS, 'section name' must name a section
+of the paper (or be 'None'), and 'justification' must be there. A response that fails raises AnswerError
+with a message that is shown to the LLM when the question is asked again.
+"""
+
+import ast
+import json
+import re
+
+from llama_index.llms.openai import OpenAI
+
+ANSWERS = ('YES', 'NO', 'NOT APPLICABLE', 'unknown')
+ANSWER_ALIASES = {'Y': 'YES', 'N': 'NO', 'N/A': 'NOT APPLICABLE', 'NA': 'NOT APPLICABLE', 'NOT_APPLICABLE': 'NOT APPLICABLE',
+                  'UNKNOWN': 'unknown'}
+NO_SECTION = ('none', 'unknown', 'n/a', '')
+
+CODE_FENCE_PATTERN = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.IGNORECASE)
+TRAILING_COMMA_PATTERN = re.compile(r',\s*([}\]])')
+# A backslash that does not start a JSON escape, e.g. from LaTeX like \cite
+LONE_BACKSLASH_PATTERN = re.compile(r'\\(?!["\\/bfnrtu])')
+SECTION_LIST_PATTERN = re.compile(r'[,;]')
+AND_PATTERN = re.compile(r'\band\b|&')
+
+class AnswerError(ValueError):
+    pass
+
+def json_mode_kwargs(llm):
+    """
+    Extra arguments asking the LLM backend for a JSON object, where it supports that (OpenAI-compatible chat models).
+    """
+    if isinstance(llm, OpenAI) and llm.metadata.is_chat_model:
+        return {'response_format': {'type': 'json_object'}}
+    return {}
+
+def json_object_text(text):
+    text = CODE_FENCE_PATTERN.sub('', text.strip())
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise AnswerError("The response is not a JSON object")
+    return text[start:end + 1]
+
+def parse_json_response(text):
+    """
+    The JSON object in an LLM response, read as leniently as possible.
+    """
+    if text is None:
+        raise AnswerError("The response is empty")
+    candidate = json_object_text(text)
+    latex_safe = candidate.replace('\\', '\\\\')
+    attempts = [
+        # Backslashes are kept as they are (the LLM quotes LaTeX), which is how responses were always read
+        lambda: json.loads(latex_safe),
+        lambda: json.loads(TRAILING_COMMA_PATTERN.sub(r'\1', latex_safe)),
+        lambda: json.loads(candidate),
+        lambda: json.loads(TRAILING_COMMA_PATTERN.sub(r'\1', LONE_BACKSLASH_PATTERN.sub(r'\\\\', candidate))),
+        lambda: ast.literal_eval(TRAILING_COMMA_PATTERN.sub(r'\1', candidate)),
+    ]
+    error = None
+    for attempt in attempts:
+        try:
+            value = attempt()
+        except (ValueError, SyntaxError, MemoryError, RecursionError) as e:
+            error = e
+            continue
+        if isinstance(value, dict):
+            return value
+        error = AnswerError("The response is not a JSON object")
+    raise AnswerError(f"The response is not valid JSON: {error}")
+
+def normalize_key(key):
+    return re.sub(r'[\s_-]+', ' ', str(key)).strip().lower()
+
+def match_section_name(value, valid_section_names):
+    """
+    The section name(s) in value, spelled as in valid_section_names, or None if any is not a section of the paper.
+    """
+    by_lower = {name.lower(): name for name in valid_section_names}
+
+    def clean(name):
+        return name.strip().strip('\'"`').strip()
+
+    if clean(value).lower() in by_lower:
+        return by_lower[clean(value).lower()]
+
+    # Several sections, e.g. "3 Dataset, Limitations" or "'Ethics Statement' and 'Limitations'"
+    names = []
+    for part in filter(None, map(clean, SECTION_LIST_PATTERN.split(value))):
+        candidates = [part] if part.lower() in by_lower else list(filter(None, map(clean, AND_PATTERN.split(part))))
+        if not all(candidate.lower() in by_lower for candidate in candidates):
+            return None
+        names.extend(by_lower[candidate.lower()] for candidate in candidates)
+    return ', '.join(names) if names else None
+
+def validate_answer(answer, valid_section_names):
+    """
+    The answer with its keys, answer value and section name normalized; AnswerError if it does not fit the schema.
+    """
+    if not isinstance(answer, dict):
+        raise AnswerError("The answer is not a JSON object")
+    fields = {normalize_key(key): value for key, value in answer.items()}
+
+    missing = [field for field in ('answer', 'section name', 'justification') if field not in fields]
+    if missing:
+        raise AnswerError(f"The answer has no {', '.join(repr(field) for field in missing)}")
+
+    value = str(fields['answer']).strip().strip('\'"').upper()
+    value = ANSWER_ALIASES.get(value, value)
+    if value not in ANSWERS:
+        raise AnswerError(f"'answer' is {fields['answer']!r}, expected one of {', '.join(repr(a) for a in ANSWERS)}")
+
+    section_name = str(fields['section name'] if fields['section name'] is not None else 'None').strip()
+    if section_name.lower() in NO_SECTION:
+        section_name = 'None' if section_name.lower() != 'unknown' else 'unknown'
+    else:
+        matched = match_section_name(section_name, valid_section_names)
+        if matched is None:
+            raise AnswerError(f"'section name' is {section_name!r}, which is not one of the valid section names")
+        section_name = matched
+
+    justification = fields['justification']
+    if justification is None or not str(justification).strip():
+        raise AnswerError("'justification' is empty")
+
+    return {'answer': value,
+            'section name': section_name,
+            'justification': justification if isinstance(justification, str) else json.dumps(justification)}
@@ -1,115 +1,286 @@
+import json
 import logging
-import os
-import tempfile
 import time
-import zipfile
-import tarfile
 import sys
+import threading
 from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from process_file import process_file
+from process_file import process_tex, get_engine
+from archive import read_upload, ArchiveError
+from cache import get_result_cache
+from config import SERVER_MODE, SERVER_HOST, SERVER_PORT, SERVER_THREADS
+from jobs import JobManager, QueueFull
+from llm_backends import BACKENDS, describe_backends
+from metrics import registry as metrics_registry
+from ratelimit import request_priority, INTERACTIVE, BATCH
 
 app = Flask(__name__)
 cors = CORS(app, resources={r'/api/*': {'origins': '*'}})
-status_updates = []
+job_manager = JobManager()
+
+# Progress of the uploads to /api/upload not read from /api/upload/status yet, by the upload ID the client chose
+status_updates = {}
+status_lock = threading.Lock()
+
+# Seconds between keep-alive comments on an idle job event stream
+JOB_EVENT_KEEPALIVE = 15
+
+# Fields of the response sent in the final 'summary' event, after the answers
+SUMMARY_FIELDS = ('issues', 'revision', 'metrics', 'time_taken')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-def extract_files(file_path, temp_dir):
-    """Extracts .tex files from zip or tar.gz archives and returns their paths."""
-    tex_files = []
+def read_uploaded_tex():
+    """
+    Validates the uploaded file and reads its LaTeX source into memory (only the .tex members of an archive).
+    Returns (tex_content, None) or (None, error_response).
+    """
+    if 'file' not in request.files:
+        return None, jsonify({'error': 'No file part'})
+
+    uploaded_file = request.files['file']
+    if uploaded_file.filename == '':
+        return None, jsonify({'error': 'No selected file'})
 
-    if file_path.endswith('.zip'):
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-            tex_files = [os.path.join(temp_dir, f) for f in zip_ref.namelist() if f.endswith('.tex')]
+    if not uploaded_file.filename.endswith(('.zip', '.tar.gz', '.tex')):
+        return None, (jsonify({'error': 'Unsupported file format. Only .zip, .tar.gz, and .tex files are allowed.'}), 400)
 
-    elif file_path.endswith('.tar.gz'):
-        with tarfile.open(file_path, 'r:gz') as tar_ref:
-            tar_ref.extractall(temp_dir)
-            tex_files = [os.path.join(temp_dir, f.name) for f in tar_ref.getmembers() if f.isfile() and f.name.endswith('.tex')]
+    try:
+        tex_content = read_upload(uploaded_file.filename, uploaded_file.stream)
+    except ArchiveError as e:
+        return None, (jsonify({'error': str(e)}), 400)
 
-    return tex_files
+    logging.info(f"Read {len(tex_content)} characters of LaTeX from {uploaded_file.filename}")
+    return tex_content, None
 
-def merge_tex_files(tex_files, output_file_path):
-    """Merges multiple .tex files into one combined .tex file."""
-    with open(output_file_path, 'w') as outfile:
-        for file_path in tex_files:
-            with open(file_path, 'r') as infile:
-                content = infile.read()
-                outfile.write(content + "\n")  
-    logging.info(f"Merged .tex files into {output_file_path}")
-    return output_file_path
+def requested_llm_backend():
+    """
+    The LLM backend named by the upload's 'llm' form field (None for the deployment's default).
+    Returns (backend name, None) or (None, error_response).
+    """
+    llm_backend = request.form.get('llm') or None
+    if llm_backend is not None and llm_backend not in BACKENDS:
+        return None, (jsonify({'error': f"Unknown LLM backend {llm_backend!r}, expected one of {sorted(BACKENDS)}"}), 400)
+    return llm_backend, None
+
+def busy_response(error):
+    """
+    429 for an upload the job queue has no room for, telling the client when to try again.
+    """
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+def run_pipeline(tex_content, progress, publish, priority=INTERACTIVE, llm_backend=None):
+    """
+    Processes the LaTeX source of an upload on a job worker, with the given LLM backend (or the default one).
+    Every checklist answer is published as an 'answer' event as soon as it is settled, and everything else
+    in the response as a final 'summary' event. The LLM and embedding requests wait with the given priority
+    when the rate limits are reached.
+    """
+    start_time = time.time()
+
+    with request_priority(priority):
+        processed_data = process_tex(tex_content, progress=progress, on_answer=lambda key, answer: publish('answer', answer),
+                                     llm_backend=llm_backend)
+
+    end_time = time.time()
+    time_taken = end_time - start_time
+    processed_data['time_taken'] = f"Time taken to generate responses: {time_taken:.6f} seconds"
+    publish('summary', {name: processed_data.get(name) for name in SUMMARY_FIELDS})
+    return processed_data
+
+def mirror_status(upload_id):
+    """
+    Progress callback appending to the status messages of upload_id (None when the client gave no ID).
+    """
+    if not upload_id:
+        return None
+
+    def append(message):
+        with status_lock:
+            status_updates.setdefault(upload_id, []).append(message)
+    return append
+
+def take_status(upload_id):
+    with status_lock:
+        return status_updates.pop(upload_id, [])
 
 @app.route("/api/upload", methods=["POST"])
 def upload_file():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'})
+    """
+    Blocking upload kept for the current frontend: the job runs on the shared worker pool
+    and its progress is mirrored to /api/upload/status?upload_id=<ID>, for the upload_id form field
+    the client chose (so concurrent uploads only see their own progress).
+    """
+    tex_content, error_response = read_uploaded_tex()
+    if error_response is not None:
+        return error_response
+    llm_backend, error_response = requested_llm_backend()
+    if error_response is not None:
+        return error_response
 
-    uploaded_file = request.files['file']
-    if uploaded_file.filename == '':
-        return jsonify({'error': 'No selected file'})
+    upload_id = request.form.get('upload_id')
+    try:
+        job = job_manager.submit(run_pipeline, tex_content, llm_backend=llm_backend, on_progress=mirror_status(upload_id))
+    except QueueFull as e:
+        return busy_response(e)
+    job.wait()
+    # Messages nobody read are dropped with the upload
+    take_status(upload_id)
 
-    # Save the uploaded file to a temporary location
-    temp_file_path = os.path.join(tempfile.gettempdir(), uploaded_file.filename)
-    uploaded_file.save(temp_file_path)
-    logging.info(f"File saved to {temp_file_path}")
+    if job.status == 'failed':
+        logging.error(f"Unexpected error: {job.error}")
+        return jsonify({'error': job.error}), 500
+    return jsonify(job.result), 200
 
-    # Directory to hold extracted files
-    temp_dir = tempfile.mkdtemp()
-    start_time = time.time()
-    processed_data = {}
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    """
+    Queues an upload and returns its job ID right away.
+    With priority=batch its LLM and embedding requests give way to those of interactive uploads,
+    and llm=<backend> answers it with another LLM backend than the default (see /api/llm).
+    """
+    tex_content, error_response = read_uploaded_tex()
+    if error_response is not None:
+        return error_response
+    llm_backend, error_response = requested_llm_backend()
+    if error_response is not None:
+        return error_response
+
+    priority = request.form.get('priority', 'interactive')
+    if priority not in ('interactive', 'batch'):
+        return jsonify({'error': "priority must be 'interactive' or 'batch'"}), 400
 
     try:
-        # Determine if we are dealing with a compressed file or a single .tex file
-        if uploaded_file.filename.endswith(('.zip', '.tar.gz')):
-            # Extract and filter for .tex files only
-            tex_files = extract_files(temp_file_path, temp_dir)
-            logging.info(f"Extracted .tex files: {tex_files}")
-
-            # Merge extracted .tex files into one combined .tex file
-            merged_tex_path = os.path.join(temp_dir, "merged.tex")
-            merged_file_path = merge_tex_files(tex_files, merged_tex_path)
-            
-            # Process the merged .tex file
-            processed_data = process_file(merged_file_path)
-
-        elif uploaded_file.filename.endswith('.tex'):
-            # Directly process the single .tex file
-            processed_data = process_file(temp_file_path)
-
-        else:
-            return jsonify({'error': 'Unsupported file format. Only .zip, .tar.gz, and .tex files are allowed.'}), 400
-
-        end_time = time.time()
-        time_taken = end_time - start_time
-        processed_data['time_taken'] = f"Time taken to generate responses: {time_taken:.6f} seconds"
-
-        return jsonify(processed_data), 200
-    except Exception as e:
-        logging.error(f"Unexpected error: {e}")
-        return jsonify({'error': str(e)}), 500
+        job = job_manager.submit(run_pipeline, tex_content, priority=BATCH if priority == 'batch' else INTERACTIVE,
+                                 llm_backend=llm_backend)
+    except QueueFull as e:
+        return busy_response(e)
+    return jsonify({'job_id': job.id,
+                    'status_url': f"/api/jobs/{job.id}",
+                    'events_url': f"/api/jobs/{job.id}/events"}), 202
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict()), 200
+
+def job_event_response(job):
+    """
+    Server-sent events for a single job: progress messages and an 'answer' event per checklist question
+    as soon as it is answered, then a 'summary' event with the issues and metrics, and a final 'done' or 'failed'.
+    """
+    def event_stream():
+        for item in job.follow(timeout=JOB_EVENT_KEEPALIVE):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    # Proxies must not buffer the stream, or answers arrive all at once at the end
+    return Response(stream_with_context(event_stream()), mimetype="text/event-stream",
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return job_event_response(job)
+
+@app.route("/api/upload/stream", methods=["POST"])
+def upload_stream():
+    """
+    Queues an upload and streams its job events in the response (see job_event_response),
+    for clients that read the response body as it arrives instead of opening an EventSource.
+    """
+    tex_content, error_response = read_uploaded_tex()
+    if error_response is not None:
+        return error_response
+    llm_backend, error_response = requested_llm_backend()
+    if error_response is not None:
+        return error_response
+
+    try:
+        job = job_manager.submit(run_pipeline, tex_content, llm_backend=llm_backend)
+    except QueueFull as e:
+        return busy_response(e)
+    return job_event_response(job)
 
 @app.route('/api/upload/status', methods=['GET'])
 def upload_status():
+    """
+    Progress messages of one /api/upload (by its upload_id) since the last request.
+    """
+    upload_id = request.args.get('upload_id')
+
     def event_stream():
-        for status in status_updates:
+        for status in take_status(upload_id):
             yield f"data: {status}\n\n"
-        status_updates.clear()
 
     return Response(stream_with_context(event_stream()), mimetype="text/event-stream")
 
-@app.route('/api/upload/status/update', methods=['POST'])
-def status_update():
-    status = request.json.get('status')
-    if status:
-        status_updates.append(status)
-    return '', 204
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    """
+    Size of the result cache, and hits and misses since startup for each kind of lookup (see cache.CACHE_KINDS).
+    """
+    return jsonify(get_result_cache().stats())
+
+@app.route('/api/llm', methods=['GET'])
+def llm_backends():
+    """
+    The LLM backends an upload can ask for with its 'llm' form field, and the default one.
+    """
+    return jsonify(describe_backends())
+
+@app.route('/api/ratelimit', methods=['GET'])
+def rate_limit_stats():
+    """
+    Configured limits, retries and total seconds requests waited for the rate limiter since startup.
+    """
+    return jsonify(get_engine().rate_limiter.describe())
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Per-stage time, call, token and cost totals since startup, in Prometheus text format.
+    """
+    return Response(metrics_registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 @app.route('/api/helloworld', methods=['GET'])
 def hello_world():
     return 'Hello World!'
 
+def serve():
+    """
+    Serves the app as configured by SERVER_MODE (see config.py).
+    """
+    if SERVER_MODE == 'development':
+        app.run(host=SERVER_HOST, port=SERVER_PORT)
+    elif SERVER_MODE == 'production':
+        try:
+            import waitress
+        except ImportError:
+            sys.exit("SERVER_MODE 'production' needs waitress: pip install waitress")
+        logging.info(f"Serving on http://{SERVER_HOST}:{SERVER_PORT} with {SERVER_THREADS} threads")
+        waitress.serve(app, host=SERVER_HOST, port=SERVER_PORT, threads=SERVER_THREADS)
+    else:
+        sys.exit(f"Unknown SERVER_MODE {SERVER_MODE!r}, expected 'development' or 'production'")
+
 if __name__ == "__main__":
-    app.run(port="8080")
+    # Build the models and prompt templates, start the CPU workers and embed the checklist queries,
+    # before the first upload arrives
+    engine = get_engine()
+    engine.cpu_pool.start()
+    engine.embed_model.warm_up()
+    try:
+        engine.query_embeddings()
+    except Exception as e:
+        logging.warning(f"Could not embed the checklist queries at startup, the first upload will: {e}")
+    serve()
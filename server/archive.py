@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Reading the LaTeX sources of an uploaded paper straight into memory.
+Only .tex members of an archive are decompressed; figures, PDFs and data files are skipped
+without ever being written to disk.
+"""
+
+from collections import OrderedDict, namedtuple
+import logging
+import posixpath
+import re
+import tarfile
+import threading
+import zipfile
+
+from cache import text_hash
+from config import UPLOAD_MAX_TEX_MB, UPLOAD_MAX_ARCHIVE_MEMBERS
+
+# Everything the include resolver needs from a file, found in one scan.
+# Comments (from an unescaped % to the end of the line) are matched so that commented-out commands are skipped.
+# \input also takes a file name without braces, ending at the first space (\input intro, \input sections/intro.tex).
+STRUCTURE_PATTERN = re.compile(r"""
+    (?P<comment>(?<!\\)%[^\n]*)
+    | \\(?:input|include)\s*\{(?P<include>[^}]*)\}
+    | \\input\s+(?P<include_bare>[^\s{}%\\]+)
+    | (?P<documentclass>\\documentclass(?![A-Za-z]))
+    | (?P<document>\\begin\s*\{document\})
+""", re.VERBOSE)
+
+# Deepest chain of nested includes that is expanded, and most include commands handled for one paper
+# (files included many times over can otherwise blow up exponentially)
+MAX_INCLUDE_DEPTH = 32
+MAX_EXPANDED_INCLUDES = 10000
+
+# Number of scanned files kept in memory, shared by all uploads (a revised paper usually changes a few files)
+FILE_STRUCTURE_CACHE_SIZE = 4096
+
+class ArchiveError(ValueError):
+    """
+    The upload cannot be read, or is over one of the upload limits.
+    """
+
+class TexReader:
+    """
+    Collects the text of .tex files, enforcing the size limit over everything read from one upload.
+    """
+    def __init__(self, max_bytes=None):
+        self.max_bytes = int(UPLOAD_MAX_TEX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+        self.total_bytes = 0
+
+    def read(self, name, file):
+        # Never trust the size recorded in the archive, read at most one byte past what is left
+        remaining = self.max_bytes - self.total_bytes
+        data = file.read(remaining + 1)
+        if len(data) > remaining:
+            raise ArchiveError(f"The .tex files are larger than the {UPLOAD_MAX_TEX_MB:g} MB limit ({name}).")
+        self.total_bytes += len(data)
+        # Same newline handling as reading the file in text mode
+        return data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+
+def is_tex_member(name):
+    # Skip the resource forks macOS adds to zip files (__MACOSX/._main.tex)
+    return name.endswith('.tex') and not name.startswith('__MACOSX/') and not posixpath.basename(name).startswith('._')
+
+def check_member_count(count):
+    if count > UPLOAD_MAX_ARCHIVE_MEMBERS:
+        raise ArchiveError(f"The archive has more than {UPLOAD_MAX_ARCHIVE_MEMBERS} files.")
+
+def read_zip_sources(fileobj, reader):
+    sources = OrderedDict()
+    try:
+        with zipfile.ZipFile(fileobj, 'r') as zip_ref:
+            members = zip_ref.infolist()
+            check_member_count(len(members))
+            for member in members:
+                if member.is_dir() or not is_tex_member(member.filename):
+                    continue
+                with zip_ref.open(member) as file:
+                    sources[member.filename] = reader.read(member.filename, file)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError) as e:
+        raise ArchiveError(f"Could not read the zip archive: {e}")
+    return sources
+
+def read_tar_sources(fileobj, reader):
+    sources = OrderedDict()
+    count = 0
+    try:
+        # Stream mode decompresses the archive once, front to back, without seeking
+        with tarfile.open(fileobj=fileobj, mode='r|gz') as tar_ref:
+            for member in tar_ref:
+                count += 1
+                check_member_count(count)
+                if not member.isfile() or not is_tex_member(member.name):
+                    continue
+                sources[member.name] = reader.read(member.name, tar_ref.extractfile(member))
+    except (tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f"Could not read the tar.gz archive: {e}")
+    return sources
+
+# Offsets of the \\input/\\include commands of a file: ((start, end, target), ...)
+FileStructure = namedtuple('FileStructure', ['includes', 'has_documentclass', 'begins_document'])
+
+_structures = OrderedDict()
+_structures_lock = threading.Lock()
+
+def file_structure(text):
+    """
+    Scans a .tex file for its includes and root-file markers, cached by the hash of its content.
+    """
+    key = text_hash(text)
+    with _structures_lock:
+        structure = _structures.get(key)
+        if structure is not None:
+            _structures.move_to_end(key)
+            return structure
+
+    includes = []
+    has_documentclass = begins_document = False
+    for match in STRUCTURE_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind in ('include', 'include_bare'):
+            includes.append((match.start(), match.end(), match.group(kind).strip()))
+        elif kind == 'documentclass':
+            has_documentclass = True
+        elif kind == 'document':
+            begins_document = True
+    structure = FileStructure(tuple(includes), has_documentclass, begins_document)
+
+    with _structures_lock:
+        _structures[key] = structure
+        while len(_structures) > FILE_STRUCTURE_CACHE_SIZE:
+            _structures.popitem(last=False)
+    return structure
+
+def find_main_file(sources):
+    """
+    Name of the file holding \\documentclass (preferring one that also begins the document), or None.
+    """
+    candidates = [name for name, text in sources.items() if file_structure(text).has_documentclass]
+    for name in candidates:
+        if file_structure(sources[name]).begins_document:
+            return name
+    return candidates[0] if candidates else None
+
+def resolve_include(target, including_file, main_file, sources):
+    """
+    Archive member named by \\input{target}, \\input target or \\include{target}, or None if it is not part of the upload.
+    LaTeX resolves paths from the main file's directory; the including file's directory is tried second.
+    """
+    for base in (posixpath.dirname(main_file), posixpath.dirname(including_file)):
+        for name in (target, target + '.tex'):
+            path = posixpath.normpath(posixpath.join(base, name))
+            if path in sources:
+                return path
+    return None
+
+class IncludeResolver:
+    """
+    Builds the document LaTeX would compile: the main file with every \\input/\\include replaced by the
+    (recursively expanded) file it names. Files that are never included are left out.
+    """
+    def __init__(self, sources, max_chars):
+        self.sources = sources
+        self.max_chars = max_chars
+        self.main_file = find_main_file(sources)
+        self.parts = []
+        self.size = 0
+        self.used = set()
+        self.expanded = 0
+
+    def resolve(self):
+        """
+        The expanded document, or None if no file has a \\documentclass.
+        """
+        if self.main_file is None:
+            return None
+        self._expand(self.main_file, [])
+        return ''.join(self.parts)
+
+    def _write(self, text):
+        self.size += len(text)
+        if self.size > self.max_chars:
+            raise ArchiveError(f"The paper is larger than the {UPLOAD_MAX_TEX_MB:g} MB limit once its includes are expanded.")
+        self.parts.append(text)
+
+    def _expand(self, name, stack):
+        self.used.add(name)
+        stack.append(name)
+        text = self.sources[name]
+        position = 0
+        for start, end, target in file_structure(text).includes:
+            self._write(text[position:start])
+            position = end
+            self.expanded += 1
+            if self.expanded > MAX_EXPANDED_INCLUDES:
+                raise ArchiveError(f"The paper has more than {MAX_EXPANDED_INCLUDES} \\input/\\include commands once expanded.")
+            path = resolve_include(target, name, self.main_file, self.sources)
+            if path is None:
+                # Not in the upload (e.g. a file generated at compile time), keep the command as it was
+                self._write(text[start:end])
+            elif path in stack:
+                logging.warning(f"Skipping circular include of {path} from {name}")
+            elif len(stack) >= MAX_INCLUDE_DEPTH:
+                logging.warning(f"Skipping {path}: includes are nested more than {MAX_INCLUDE_DEPTH} deep")
+            else:
+                self._expand(path, stack)
+        self._write(text[position:])
+        stack.pop()
+
+def read_upload(filename, fileobj):
+    """
+    Returns the LaTeX source of an uploaded .tex, .zip or .tar.gz file as one string.
+    Archives are resolved from their main file, see IncludeResolver.
+    """
+    reader = TexReader()
+
+    if filename.endswith('.tex'):
+        return reader.read(filename, fileobj)
+
+    if filename.endswith('.zip'):
+        sources = read_zip_sources(fileobj, reader)
+    elif filename.endswith('.tar.gz'):
+        sources = read_tar_sources(fileobj, reader)
+    else:
+        raise ArchiveError('Unsupported file format. Only .zip, .tar.gz, and .tex files are allowed.')
+
+    if not sources:
+        raise ArchiveError('The archive does not contain any .tex files.')
+
+    resolver = IncludeResolver(sources, reader.max_bytes)
+    tex_content = resolver.resolve()
+    if tex_content is None:
+        # No root file to start from, fall back to every file in archive order
+        logging.info(f"No \\documentclass found, merging .tex files: {list(sources)}")
+        return ''.join(sources[name] + "\n" for name in sources)
+
+    logging.info(f"Expanded {resolver.main_file} with {len(resolver.used) - 1} included files, "
+                 f"skipped {len(sources) - len(resolver.used)} unused .tex files")
+    return tex_content
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Processing a whole directory (or manifest) of submissions at once, see `python aclready.py batch --help`.
+
+Every .tex, .zip and .tar.gz file under the directory, or listed in the manifest, is one submission.
+Papers are processed by a pool of worker processes that share the on-disk embedding and result caches,
+and each result is appended to a JSONL file as soon as its paper finishes. Running the same command again
+after an interruption skips the papers that already have a result in the file (failed papers are retried).
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import logging
+import os
+import time
+
+from archive import read_upload
+from process_file import get_engine, process_tex
+from ratelimit import request_priority, BATCH
+
+SUBMISSION_EXTENSIONS = ('.tex', '.zip', '.tar.gz')
+
+def find_submissions(source):
+    """
+    OrderedDict of submission ID -> path. The ID is the path relative to the directory, or the path as
+    written in the manifest (one per line, relative to the manifest's directory, # starts a comment).
+    """
+    submissions = OrderedDict()
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(SUBMISSION_EXTENSIONS) and not name.startswith('.'):
+                    path = os.path.join(root, name)
+                    submissions[os.path.relpath(path, source)] = path
+        return submissions
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r') as file:
+        for line in file:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                submissions[line] = os.path.join(base, line)
+    return submissions
+
+def read_finished(output):
+    """
+    IDs of the submissions that already have a successful result in the JSONL output.
+    A line cut off by an interruption is ignored.
+    """
+    finished = set()
+    if not os.path.exists(output):
+        return finished
+    with open(output, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get('status') == 'done':
+                finished.add(record.get('id'))
+    return finished
+
+def open_output(output):
+    """
+    Opens the JSONL output for appending, starting on a new line if the last one was cut off.
+    """
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    file = open(output, 'a+b')
+    if file.tell() > 0:
+        file.seek(-1, os.SEEK_END)
+        if file.read(1) != b'\n':
+            file.write(b'\n')
+    return file
+
+def append_record(file, record):
+    # Written and synced line by line, so an interruption loses at most the paper being written
+    file.write((json.dumps(record) + '\n').encode('utf-8'))
+    file.flush()
+    os.fsync(file.fileno())
+
+def init_worker(workers, llm_backend=None):
+    # Models, prompts and caches are set up once per worker process, not once per paper.
+    # Batch workers are processes already, so CPU-bound stages run in them directly,
+    # and the rate limits of the account are split between them.
+    engine = get_engine(llm_backend)
+    engine.cpu_pool.workers = 0
+    engine.rate_limiter.scale(1 / workers)
+
+def process_submission(submission_id, path, inference_mode, max_concurrency, query_timeout, llm_backend=None):
+    """
+    Runs one submission in a worker process and returns its JSONL record.
+    """
+    start = time.time()
+    engine = get_engine(llm_backend)
+    record = {'id': submission_id, 'path': path, 'llm': engine.llm_model, 'llm_backend': engine.llm_backend}
+    try:
+        with open(path, 'rb') as file:
+            tex_content = read_upload(path, file)
+        with request_priority(BATCH):
+            result = process_tex(tex_content, max_concurrency, query_timeout, progress=lambda message: None,
+                                 inference_mode=inference_mode, llm_backend=llm_backend)
+    except Exception as e:
+        record.update(status='failed', error=str(e))
+    else:
+        record.update(status='done', result=result)
+    record['seconds'] = round(time.time() - start, 3)
+    return record
+
+def run_batch(source, output, workers, inference_mode, max_concurrency, query_timeout, llm_backend=None):
+    """
+    Processes every submission of source that has no result in output yet, with the given LLM backend
+    (LLM_BACKEND when not given).
+    Returns the number of (done, failed, skipped) submissions.
+    """
+    submissions = find_submissions(source)
+    finished = read_finished(output)
+    pending = [(submission_id, path) for submission_id, path in submissions.items() if submission_id not in finished]
+    skipped = len(submissions) - len(pending)
+    logging.info(f"{len(submissions)} submissions in {source}, {skipped} already in {output}, "
+                 f"processing {len(pending)} with {workers} workers")
+
+    done = failed = 0
+    with open_output(output) as file:
+        workers = max(1, workers)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(workers, llm_backend))
+        try:
+            futures = {pool.submit(process_submission, submission_id, path, inference_mode, max_concurrency,
+                                   query_timeout, llm_backend): (submission_id, path)
+                       for submission_id, path in pending}
+            for future in as_completed(futures):
+                submission_id, path = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # The worker process itself died (e.g. out of memory)
+                    record = {'id': submission_id, 'path': path, 'status': 'failed', 'error': str(e)}
+                append_record(file, record)
+
+                if record['status'] == 'done':
+                    done += 1
+                else:
+                    failed += 1
+                    logging.warning(f"{submission_id} failed: {record['error']}")
+                logging.info(f"[{done + failed}/{len(pending)}] {submission_id}: {record['status']}"
+                             + (f" in {record['seconds']:.1f} s" if 'seconds' in record else ''))
+        except KeyboardInterrupt:
+            logging.warning(f"Interrupted after {done + failed} of {len(pending)} submissions, run again to resume")
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+    return done, failed, skipped
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmark of the checklist pipeline.
+
+Runs the full pipeline (LaTeX preprocessing, section routing, chunking, indexing, retrieval, synthesis and
+orchestration) on the example papers and on generated larger papers, with a local stand-in for the LLM
+and hash-based embeddings, so no network access or API key is needed. Latency of the stand-ins is
+configurable to mimic the real services. --llm measures a real LLM backend instead of the stand-in, e.g. a
+local llama.cpp or vLLM server (see llm_backends.py).
+
+Reports per-stage timings, peak memory and throughput:
+
+    python benchmark.py
+    python benchmark.py --sizes 1 4 16 --llm-latency 0.5 --embedding-latency 0.05 --json results.json
+    python benchmark.py --sizes 1 --llm local
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+from cache import ResultCache, EmbeddingStore
+from cpu_pool import CpuPool
+from embeddings import CachedEmbedding
+from llm_backends import BACKENDS
+from process_file import ChecklistEngine
+from rerank import Reranker, RERANK_MODES
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'resources', 'tex_examples')
+EXAMPLE_PAPERS = ['FOMCacl2023.tex', 'FiNER.tex']
+
+# Stages reported in the table, in pipeline order (see metrics.py)
+REPORTED_STAGES = ['parse_latex', 'routing', 'chunking', 'embedding', 'index_build', 'retrieval', 'rerank', 'synthesis']
+
+GROUPED_KEYS_PATTERN = re.compile(r"question IDs (.*?) as the keys")
+QUESTION_ID_PATTERN = re.compile(r"'([A-E]\d)'")
+SECTION_PATTERN = re.compile(r'\\section\{([^}]*)\}')
+
+class FakeLLM(CustomLLM):
+    """
+    Answers every checklist prompt after a fixed delay with a well-formed answer
+    (one per question ID for grouped prompts).
+    """
+    latency: float = 0.0
+    context_window: int = 16385
+    num_output: int = 256
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=self.context_window, num_output=self.num_output, model_name='fake-llm')
+
+    def _answer(self, prompt):
+        answer = {'answer': 'YES', 'section name': 'None', 'justification': 'Benchmark answer.'}
+        grouped = GROUPED_KEYS_PATTERN.search(prompt)
+        if grouped:
+            answer = {key: answer for key in QUESTION_ID_PATTERN.findall(grouped.group(1))}
+        return json.dumps(answer)
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self.latency)
+        return CompletionResponse(text=self._answer(prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        response = self.complete(prompt, formatted, **kwargs)
+        yield response
+
+class HashEmbedding(BaseEmbedding):
+    """
+    Deterministic embeddings derived from the SHA-256 of the text, after a fixed delay per request.
+    """
+    latency: float = 0.0
+    dimensions: int = 256
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _vector(self, text):
+        digest = b''
+        counter = 0
+        while len(digest) < self.dimensions:
+            digest += hashlib.sha256(f"{counter}|{text}".encode('utf-8')).digest()
+            counter += 1
+        return [byte / 127.5 - 1.0 for byte in digest[:self.dimensions]]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+def generate_paper(tex_content, scale):
+    """
+    A larger paper made from tex_content: its body (after the abstract, up to the bibliography)
+    repeated scale times, with the section titles of each copy made unique.
+    """
+    start = tex_content.find('\\end{abstract}')
+    start = start + len('\\end{abstract}') if start != -1 else tex_content.find('\\begin{document}')
+    end = tex_content.find('\\bibliography')
+    if end == -1:
+        end = tex_content.find('\\end{document}')
+    body = tex_content[start:end]
+
+    copies = [body] + [SECTION_PATTERN.sub(lambda match: f"\\section{{{match.group(1)} (part {i})}}", body)
+                       for i in range(2, scale + 1)]
+    return tex_content[:start] + ''.join(copies) + tex_content[end:]
+
+def load_papers(sizes, base_paper):
+    """
+    (name, LaTeX source) of the example papers and of base_paper scaled to each of sizes (> 1).
+    """
+    papers = []
+    for filename in EXAMPLE_PAPERS:
+        with open(os.path.join(EXAMPLES_DIR, filename), 'r') as file:
+            papers.append((filename, file.read()))
+
+    base_content = dict(papers).get(base_paper)
+    if base_content is None:
+        with open(base_paper, 'r') as file:
+            base_content = file.read()
+
+    for scale in sizes:
+        if scale > 1:
+            papers.append((f"{os.path.basename(base_paper)} x{scale}", generate_paper(base_content, scale)))
+    return papers
+
+def build_engine(args, cache_dir, cpu_pool=None):
+    llm = None if args.llm else FakeLLM(latency=args.llm_latency)
+    embed_model = HashEmbedding(latency=args.embedding_latency, dimensions=args.dimensions)
+    store = EmbeddingStore(os.path.join(cache_dir, 'embeddings.sqlite'))
+    engine = ChecklistEngine(llm=llm,
+                             embed_model=CachedEmbedding(embed_model, store=store),
+                             result_cache=ResultCache(os.path.join(cache_dir, 'results.sqlite')),
+                             cpu_pool=cpu_pool or CpuPool(workers=args.cpu_workers),
+                             llm_backend=args.llm)
+    engine.section_routing = not args.no_routing
+    engine.reranker = Reranker(engine.llm, mode=args.rerank, question_modes={})
+    return engine
+
+def run_paper(args, name, tex_content, trace_memory, cpu_pool):
+    """
+    Processes one paper on a fresh engine (cold caches unless --warm) and returns its measurements.
+    """
+    cache_dir = tempfile.mkdtemp(prefix='aclready-benchmark-')
+    try:
+        engine = build_engine(args, cache_dir, cpu_pool)
+        if args.warm:
+            engine.process_tex(tex_content, args.concurrency, args.timeout, progress=lambda message: None,
+                               inference_mode=args.mode)
+
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        results = engine.process_tex(tex_content, args.concurrency, args.timeout, progress=lambda message: None,
+                                     inference_mode=args.mode)
+        seconds = time.perf_counter() - start
+        peak_traced = tracemalloc.get_traced_memory()[1] / 2**20 if trace_memory else None
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    metrics = results['metrics']
+    return {'paper': name,
+            'size_kb': len(tex_content.encode('utf-8')) / 1024,
+            'seconds': seconds,
+            'stages': {stage: counters['seconds'] for stage, counters in metrics['stages'].items()},
+            'llm_calls': metrics['total']['llm_calls'],
+            'embedding_calls': metrics['total']['embedding_calls'],
+            'prompt_tokens': metrics['total']['prompt_tokens'],
+            'failed_questions': sum(1 for value in results.values() if isinstance(value, dict) and 'error' in value),
+            'peak_traced_mb': peak_traced}
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+def print_report(runs, summary):
+    header = ['paper', 'KB', 'total s'] + [f"{stage} s" for stage in REPORTED_STAGES] + ['LLM', 'embed', 'peak MB']
+    rows = [[run['paper'], f"{run['size_kb']:.0f}", f"{run['seconds']:.2f}"]
+            + [f"{run['stages'].get(stage, 0):.2f}" for stage in REPORTED_STAGES]
+            + [str(run['llm_calls']), str(run['embedding_calls']),
+               '-' if run['peak_traced_mb'] is None else f"{run['peak_traced_mb']:.1f}"]
+            for run in runs]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths))))
+    print()
+    print(f"{summary['papers']} papers in {summary['seconds']:.2f} s: {summary['papers_per_minute']:.1f} papers/min, "
+          f"peak RSS {summary['peak_rss_mb']:.0f} MB")
+    print("Rerank and synthesis seconds are summed over the questions, which run concurrently.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the checklist pipeline offline with a fake LLM and hash embeddings.')
+    parser.add_argument('--sizes', type=int, nargs='*', default=[4, 16],
+                        help='Also run generated papers with the body of --base-paper repeated this many times')
+    parser.add_argument('--base-paper', default='FiNER.tex', help='Example paper (or path to a .tex file) to generate larger papers from')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='Seconds per LLM call')
+    parser.add_argument('--llm', choices=sorted(BACKENDS),
+                        help='Answer with this LLM backend instead of the stand-in (needs the backend to be reachable)')
+    parser.add_argument('--embedding-latency', type=float, default=0.0, help='Seconds per embedding request')
+    parser.add_argument('--dimensions', type=int, default=256, help='Size of the fake embedding vectors')
+    parser.add_argument('--mode', choices=['question', 'grouped'], default='question', help='Inference mode')
+    parser.add_argument('--no-routing', action='store_true', help='Use vector retrieval for every question')
+    parser.add_argument('--rerank', choices=RERANK_MODES, default='none', help='Rerank mode for every question')
+    parser.add_argument('--concurrency', type=int, default=4, help='Checklist questions answered at the same time')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds per question before it is reported as failed')
+    parser.add_argument('--repeat', type=int, default=1, help='Process every paper this many times')
+    parser.add_argument('--parallel', type=int, default=1, help='Papers processed at the same time')
+    parser.add_argument('--cpu-workers', type=int, default=0,
+                        help='Processes for LaTeX preprocessing and sentence chunking, shared by all papers (0 runs them inline)')
+    parser.add_argument('--warm', action='store_true', help='Measure a second run of each paper, with caches filled by the first')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Report the peak Python heap of each paper (tracemalloc, slows the run down; needs --parallel 1)')
+    parser.add_argument('--json', help='Also write the measurements to this file')
+    args = parser.parse_args()
+
+    papers = load_papers(args.sizes, args.base_paper) * args.repeat
+    trace_memory = args.trace_memory and args.parallel == 1
+    if trace_memory:
+        tracemalloc.start()
+
+    cpu_pool = CpuPool(workers=args.cpu_workers)
+    cpu_pool.start()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as pool:
+            runs = list(pool.map(lambda paper: run_paper(args, paper[0], paper[1], trace_memory, cpu_pool), papers))
+    finally:
+        cpu_pool.shutdown()
+    seconds = time.perf_counter() - start
+
+    summary = {'papers': len(runs),
+               'seconds': seconds,
+               'papers_per_minute': len(runs) / seconds * 60,
+               'peak_rss_mb': peak_rss_mb(),
+               'settings': vars(args)}
+    print_report(runs, summary)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'runs': runs, 'summary': summary}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
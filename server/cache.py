@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk caches shared by every request (and every process) of the server.
+"""
+
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from config import CACHE_DIR, RESULT_CACHE_MAX_AGE_DAYS, RESULT_CACHE_MAX_MB
+
+def text_hash(text):
+    """
+    Stable hex digest used for every cache key.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def normalize_chunk(chunk):
+    """
+    Whitespace differences do not change what the LLM sees, so they should not change cache keys.
+    """
+    return ' '.join(chunk.split())
+
+def paper_key(list_chunks, model_name, prompts, settings=None):
+    """
+    Key of a whole paper: the preprocessed LaTeX chunks, the model and the prompt text,
+    plus any other pipeline settings that change what the LLM is shown (e.g. the chunking policy).
+    """
+    chunks_hash = text_hash(json.dumps([normalize_chunk(chunk) for chunk in list_chunks]))
+    prompts_hash = text_hash(json.dumps(prompts))
+    if settings:
+        prompts_hash = text_hash(f"{prompts_hash}|{json.dumps(settings, sort_keys=True)}")
+    return text_hash(f"paper|{model_name}|{prompts_hash}|{chunks_hash}")
+
+def question_key(model_name, prompt, context):
+    """
+    Key of a single checklist answer: the model, the question prompt and the retrieved context it was answered from.
+    """
+    context_hash = text_hash(json.dumps([normalize_chunk(text) for text in context]))
+    return text_hash(f"question|{model_name}|{text_hash(prompt)}|{context_hash}")
+
+# What a lookup is for: a whole paper, one answer, the answers of a checklist section asked together,
+# or the previous version of a paper. Hits and misses are counted for each.
+CACHE_KINDS = ('paper', 'question', 'group', 'revision')
+
+class ResultCache:
+    """
+    Content-addressed cache of checklist results stored in SQLite.
+    Entries older than max_age_days are dropped, and once the cache grows past max_mb
+    the least recently used entries are dropped first.
+    """
+    def __init__(self, path=None, max_age_days=RESULT_CACHE_MAX_AGE_DAYS, max_mb=RESULT_CACHE_MAX_MB):
+        self.path = path or os.path.join(CACHE_DIR, 'results.sqlite')
+        self.max_age = max_age_days * 24 * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # kind -> [hits, misses]
+        self.counts = {kind: [0, 0] for kind in CACHE_KINDS}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS results (
+                                key TEXT PRIMARY KEY,
+                                value TEXT NOT NULL,
+                                size INTEGER NOT NULL,
+                                created REAL NOT NULL,
+                                last_used REAL NOT NULL)""")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, kind, hit):
+        with self._lock:
+            self.counts.setdefault(kind, [0, 0])[0 if hit else 1] += 1
+
+    def get(self, key, kind='paper'):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.max_age:
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+
+        self._count(kind, row is not None)
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key, value):
+        now = time.time()
+        data = json.dumps(value)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", (key, data, len(data), now, now))
+        self.evict()
+
+    def evict(self):
+        """
+        Drops expired entries, then least recently used ones until the cache fits in max_bytes.
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE created < ?", (time.time() - self.max_age,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        with self._lock:
+            kinds = {kind: {'hits': hits, 'misses': misses,
+                            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None}
+                     for kind, (hits, misses) in self.counts.items()}
+        return {'kinds': kinds, 'entries': entries, 'bytes': size}
+
+_result_cache = None
+
+def get_result_cache():
+    """
+    Process-wide result cache, created on first use.
+    """
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
+
+class EmbeddingStore:
+    """
+    Disk-backed embedding vectors stored in SQLite as float32 blobs, keyed by (embedding model, text hash).
+    """
+    # SQLite limits the number of parameters in a single statement
+    _batch = 500
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, 'embeddings.sqlite')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS embeddings (
+                                model TEXT NOT NULL,
+                                hash TEXT NOT NULL,
+                                vector BLOB NOT NULL,
+                                PRIMARY KEY (model, hash))""")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, model, hashes):
+        """
+        Returns {hash: vector} for the hashes that are stored.
+        """
+        hashes = list(set(hashes))
+        found = {}
+        with self._connect() as conn:
+            for start in range(0, len(hashes), self._batch):
+                batch = hashes[start:start + self._batch]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                                    [model] + batch)
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model, vectors):
+        """
+        Stores {hash: vector}.
+        """
+        rows = [(model, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+
+_embedding_store = None
+
+def get_embedding_store():
+    """
+    Process-wide embedding store, created on first use.
+    """
+    global _embedding_store
+    if _embedding_store is None:
+        _embedding_store = EmbeddingStore()
+    return _embedding_store
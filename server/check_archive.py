@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of the include resolver (archive.py) on small in-memory archives, no network access needed:
+
+    python check_archive.py
+
+Exits with an error on the first archive whose expanded document is not the expected one.
+"""
+
+import io
+import zipfile
+
+from archive import read_upload
+
+MAIN = r"""\documentclass{article}
+\begin{document}
+\input{intro}
+\input method
+\input results.tex
+{\input sections/discussion}
+\include{sections/limitations}
+% \input{draft}
+\input{generated}
+\end{document}
+"""
+
+# (name, files of the archive, expected document)
+CASES = [
+    ('braces, bare names and subdirectories', {
+        'paper/main.tex': MAIN,
+        'paper/intro.tex': 'INTRO\n',
+        'paper/method.tex': 'METHOD\n',
+        'paper/results.tex': 'RESULTS\n',
+        'paper/sections/discussion.tex': 'DISCUSSION',
+        'paper/sections/limitations.tex': 'LIMITATIONS\n',
+        'paper/draft.tex': 'DRAFT\n',
+        'paper/unused.tex': 'UNUSED\n',
+    }, MAIN.replace(r'\input{intro}', 'INTRO\n')
+           .replace(r'\input method', 'METHOD\n')
+           .replace(r'\input results.tex', 'RESULTS\n')
+           .replace(r'\input sections/discussion', 'DISCUSSION')
+           .replace(r'\include{sections/limitations}', 'LIMITATIONS\n')),
+    ('nested bare includes from the main directory', {
+        'main.tex': '\\documentclass{article}\n\\begin{document}\n\\input sections/all\n\\end{document}\n',
+        'sections/all.tex': '\\input sections/a\n\\input{sections/b}\n',
+        'sections/a.tex': 'A',
+        'sections/b.tex': 'B',
+    }, '\\documentclass{article}\n\\begin{document}\nA\nB\n\n\\end{document}\n'),
+    ('circular includes', {
+        'main.tex': '\\documentclass{article}\n\\input loop\n',
+        'loop.tex': 'LOOP \\input main\n',
+    }, '\\documentclass{article}\nLOOP \n\n'),
+    ('commands that only look like includes', {
+        'main.tex': '\\documentclass{article}\n\\inputencoding{utf8}\n\\input\n{intro}\n100\\% \\input intro\n',
+        'intro.tex': 'INTRO',
+    }, '\\documentclass{article}\n\\inputencoding{utf8}\nINTRO\n100\\% INTRO\n'),
+]
+
+def zipped(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, text in files.items():
+            archive.writestr(name, text)
+    buffer.seek(0)
+    return buffer
+
+def main():
+    for name, files, expected in CASES:
+        document = read_upload('paper.zip', zipped(files))
+        assert document == expected, f"{name}: expected\n{expected!r}\ngot\n{document!r}"
+        print(f"ok  {name}")
+
+if __name__ == "__main__":
+    main()
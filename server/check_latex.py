@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Compatibility check of the LaTeX preprocessing (latex.py) against the code it replaced (latex_reference.py):
+both must give the same section chunks and title for every example paper.
+
+    python check_latex.py
+    python check_latex.py paper.tex other.tex
+
+The two only differ on malformed LaTeX, where the regexes of the reference and the scan of latex.py pair up
+braces and environments differently. Those documents are listed in KNOWN_DIVERGENCES with what latex.py gives
+for them, so a change there does not go unnoticed either.
+
+Exits with an error on the first paper where they differ.
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+
+import latex
+import latex_reference
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'resources', 'tex_examples')
+
+ABSTRACT = '\\begin{abstract}\nAbstract.\n\\end{abstract}\n'
+
+# (name, document, chunks and title latex.py gives, how the reference differs)
+KNOWN_DIVERGENCES = [
+    ('section heading inside an unclosed caption',
+     ABSTRACT + '\\section{Method}\nWe train.\n\\begin{table}\n\\caption{Scores\n\\section{Results}\n\\end{table}\n'
+                'Scores go up.\n\\section{Limitations}\nFew.\n',
+     (['\\section*{abstract} Abstract.  ',
+       '\\section{1 Method} We train. Table 1 Description: Scores \\section{Results. End Table 1 Description. Scores go up. ',
+       '\\section{2 Limitations} Few.'], ''),
+     "the reference numbers the heading inside the caption and starts a chunk there, the next heading "
+     "is left unnumbered"),
+    ('subsection heading inside an unclosed caption',
+     ABSTRACT + '\\section{Method}\n\\begin{table}\n\\caption{Scores\n\\subsection{Results}\n\\end{table}\n'
+                'Scores go up.\n\\subsection{Analysis}\nMore.\n',
+     (['\\section*{abstract} Abstract.  ',
+       '\\section{1 Method} Table 1 Description: Scores \\subsection{Results. End Table 1 Description. Scores go up. '
+       '\\subsection{1.1 Analysis} More.'], ''),
+     "the reference numbers the heading inside the caption, the next heading is left unnumbered"),
+    ('table opened inside a figure and closed after it',
+     ABSTRACT + '\\section{Method}\nWe train.\n\\begin{figure}\n\\caption{Model}\n\\begin{table}\n\\end{figure}\n'
+                '\\end{table}\n\\section{Results}\nScores go up.\n\\section{Limitations}\nFew.\n',
+     (['\\section*{abstract} Abstract.  ', '\\section{1 Method} We train.'], ''),
+     "the reference removes the table with the figure's \\end, then keeps the figure, which has no \\end left, "
+     "and the rest of the paper as text; latex.py never closes the figure and drops everything after it"),
+    ('table left open inside a figure',
+     ABSTRACT + '\\section{Method}\n\\begin{figure}\n\\caption{Model}\n\\begin{table}\n\\end{figure}\n'
+                '\\section{Results}\nScores go up.\n\\begin{figure}\n\\end{figure}\n\\end{table}\n'
+                '\\section{Limitations}\nFew.\n',
+     (['\\section*{abstract} Abstract.  ', '\\section{1 Method}'], ''),
+     "the reference keeps the outer figure and the Limitations section as text, latex.py drops everything "
+     "after the figure"),
+]
+
+def first_difference(expected, actual):
+    for i, (expected_chunk, actual_chunk) in enumerate(zip(expected, actual)):
+        if expected_chunk != actual_chunk:
+            return f"chunk {i} differs:\n  reference: {expected_chunk[:200]!r}\n  new:       {actual_chunk[:200]!r}"
+    return f"{len(expected)} chunks in the reference, {len(actual)} in the new output"
+
+def reference_output(tex_content):
+    # The reference only reads files
+    with tempfile.NamedTemporaryFile('w', suffix='.tex', delete=False) as file:
+        file.write(tex_content)
+    try:
+        return latex_reference.read_latex_doc(file.name)
+    finally:
+        os.remove(file.name)
+
+def check_known_divergences():
+    for name, tex_content, expected, difference in KNOWN_DIVERGENCES:
+        output = latex.preprocess_latex(tex_content)
+        assert output == expected, f"{name}: expected\n{expected!r}\ngot\n{output!r}"
+        # Once the reference agrees, the document belongs with the papers that must match
+        assert reference_output(tex_content) != output, f"{name}: the reference gives the same output now"
+        print(f"ok  {name} (known divergence: {difference})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the LaTeX preprocessing with the reference implementation.')
+    parser.add_argument('papers', nargs='*', help='.tex files to compare (the example papers by default)')
+    args = parser.parse_args()
+
+    papers = args.papers or sorted(glob.glob(os.path.join(EXAMPLES_DIR, '*.tex')))
+    assert papers, f"No papers found in {EXAMPLES_DIR}"
+    for path in papers:
+        expected_chunks, expected_title = latex_reference.read_latex_doc(path)
+        chunks, title = latex.read_latex_doc(path)
+        assert chunks == expected_chunks, f"{path}: {first_difference(expected_chunks, chunks)}"
+        assert title == expected_title, f"{path}: title {title!r}, expected {expected_title!r}"
+        print(f"ok  {os.path.basename(path)}: {len(chunks)} chunks")
+
+    if not args.papers:
+        check_known_divergences()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of the client-side rate limiting (ratelimit.py) against the local stub of the OpenAI API
+(stub_openai.py), no network access or API key needed:
+
+    python check_ratelimit.py
+
+- a 429 with Retry-After is retried, and holds back the model's other requests until Retry-After has passed
+- interactive requests waiting for a model go ahead of batch ones
+- the requests and tokens per minute of a model hold, with tokens corrected by the usage the provider reports
+
+Exits with an error on the first check that fails. Takes a few seconds, the limits below are small on purpose.
+"""
+
+import threading
+import time
+
+import httpx
+
+from ratelimit import RateLimiter, RateLimitedTransport, request_priority, request_tokens, INTERACTIVE, BATCH
+import stub_openai
+
+MODEL = 'stub-model'
+
+# Measured waits may come out a little short of the computed ones (clock and thread wake-up granularity)
+TOLERANCE = 0.9
+
+def client(limiter, port):
+    return httpx.Client(base_url=f"http://127.0.0.1:{port}/v1",
+                        transport=RateLimitedTransport(httpx.HTTPTransport(), limiter))
+
+def chat_body(content):
+    return {'model': MODEL, 'messages': [{'role': 'user', 'content': content}]}
+
+def chat(http_client, content='Is it limited?'):
+    response = http_client.post('/chat/completions', json=chat_body(content))
+    return response.status_code, response.json().get('usage', {}).get('total_tokens')
+
+def in_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def check_retry_after():
+    retry_after = 0.5
+    server, state = stub_openai.start(stub_openai.StubState(fail_first=2, retry_after=retry_after))
+    limiter = RateLimiter({MODEL: (0, 0)}, max_retries=3, backoff_base=0.01)
+    statuses = []
+    with client(limiter, server.server_address[1]) as http_client:
+        first = threading.Thread(target=lambda: statuses.append(chat(http_client)[0]))
+        first.start()
+        # A second request sent while the model is paused by the first one's 429 waits as well
+        while not state.arrivals(429):
+            time.sleep(0.005)
+        second = threading.Thread(target=lambda: statuses.append(chat(http_client)[0]))
+        second.start()
+        first.join()
+        second.join()
+    server.shutdown()
+
+    first_429 = state.arrivals(429)[0]
+    later = sorted(state.arrivals(429)[1:] + state.arrivals(200))
+    assert statuses == [200, 200], f"expected both requests to succeed, got {statuses}"
+    assert limiter.retries == 2, f"expected 2 retries, got {limiter.retries}"
+    assert later[0] - first_429 >= retry_after * TOLERANCE, \
+        f"a request reached the stub {later[0] - first_429:.3f} s after a 429 with Retry-After {retry_after}"
+
+def check_priority():
+    # 600 requests a minute: once the bucket is empty, one request every 0.1 s
+    limiter = RateLimiter({MODEL: (600, 0)})
+    for _ in range(600):
+        limiter.acquire(MODEL, 1)
+
+    order = []
+
+    def waiter(priority, name):
+        def run():
+            with request_priority(priority):
+                limiter.acquire(MODEL, 1)
+            order.append(name)
+        return threading.Thread(target=run)
+
+    # Batch requests start waiting first, the interactive ones still get the first slots
+    threads = [waiter(BATCH, f'batch {number}') for number in range(3)] + \
+              [waiter(INTERACTIVE, f'interactive {number}') for number in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    expected = ['interactive 0', 'interactive 1', 'batch 0', 'batch 1', 'batch 2']
+    assert order == expected, f"expected {expected}, got {order}"
+
+def check_request_limit():
+    requests_per_minute = 600
+    server, state = stub_openai.start()
+    limiter = RateLimiter({MODEL: (requests_per_minute, 0)})
+    for _ in range(requests_per_minute):
+        limiter.acquire(MODEL, 1)
+
+    statuses = []
+    with client(limiter, server.server_address[1]) as http_client:
+        in_threads([lambda: statuses.append(chat(http_client)[0]) for _ in range(5)])
+    server.shutdown()
+
+    arrivals = sorted(state.arrivals(200))
+    gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+    assert statuses == [200] * 5, f"expected 5 successful requests, got {statuses}"
+    assert min(gaps) >= 60 / requests_per_minute * TOLERANCE, \
+        f"requests reached the stub {min(gaps):.3f} s apart, over {requests_per_minute} a minute"
+
+def check_token_limit():
+    tokens_per_minute = 60000
+    # The stub reports many more tokens than the request was estimated at, as a long answer would
+    server, state = stub_openai.start(stub_openai.StubState(completion_tokens=300))
+    limiter = RateLimiter({MODEL: (0, tokens_per_minute)})
+    limiter.acquire(MODEL, tokens_per_minute)
+    emptied = time.monotonic()
+
+    # About 500 tokens estimated and 800 used each, sent one after the other
+    contents = [f"Question {number}: " + 'word ' * 400 for number in range(3)]
+    usages = []
+    with client(limiter, server.server_address[1]) as http_client:
+        for number, content in enumerate(contents):
+            status, tokens = chat(http_client, content)
+            assert status == 200, f"request {number} failed with {status}"
+            usages.append(tokens)
+    server.shutdown()
+
+    # The last request waits until the bucket has refilled what the ones before it actually used, and its own estimate
+    arrivals = sorted(state.arrivals(200))
+    tokens = sum(usages[:-1]) + request_tokens(chat_body(contents[-1]))
+    needed = tokens / (tokens_per_minute / 60)
+    assert arrivals[-1] - emptied >= needed * TOLERANCE, \
+        f"{tokens} tokens went through in {arrivals[-1] - emptied:.3f} s, over {tokens_per_minute} a minute"
+
+CHECKS = [
+    ('429 with Retry-After', check_retry_after),
+    ('interactive before batch', check_priority),
+    ('requests per minute', check_request_limit),
+    ('tokens per minute', check_token_limit),
+]
+
+def main():
+    for name, check in CHECKS:
+        start = time.monotonic()
+        check()
+        print(f"ok  {name} ({time.monotonic() - start:.1f} s)")
+
+if __name__ == "__main__":
+    main()
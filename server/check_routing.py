@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of the section routing (routing.py) on small made-up papers, no network access or LLM needed:
+
+    python check_routing.py
+
+Exits with an error on the first question routed to other sections than expected ([] means the question is
+left to vector retrieval).
+"""
+
+from llama_index.core.schema import TextNode
+
+from routing import SectionRouter
+
+def paper(*sections):
+    # One node per section, named like build_base_nodes names them
+    return [TextNode(text=f"\\section{{{name}}} {text}", id_=name) for name, text in sections]
+
+ABSTRACT = ('abstract', 'We tag financial filings with XBRL entity types.')
+INTRODUCTION = ('1 Introduction', 'Numeric entities are hard to tag.')
+
+# (name, sections of the paper, question, expected section names)
+CASES = [
+    ('generic data titles without attribution are left to retrieval',
+     paper(ABSTRACT, INTRODUCTION,
+           ('2 Data Preprocessing', 'We lowercase all tokens and drop tables.'),
+           ('3 Training Data', 'The training data has 900k sentences.'),
+           ('4 Resources Used', 'Experiments ran on one machine.')),
+     'B1', []),
+    ('a data section that names the creators is routed to',
+     paper(ABSTRACT, INTRODUCTION,
+           ('2 Training Data', 'The training data has 900k sentences.'),
+           ('3 Datasets', 'We use FiNER-139, released by Loukas et al. (2022), under CC BY-SA.')),
+     'B1', ['3 Datasets']),
+    ('an artifacts section is routed to on its title',
+     paper(ABSTRACT, INTRODUCTION, ('5 Scientific Artifacts', 'All models come from the model hub.')),
+     'B1', ['5 Scientific Artifacts']),
+    ('a limitations section is routed to on its title',
+     paper(ABSTRACT, INTRODUCTION, ('Limitations', 'Only English filings are covered.')),
+     'A1', ['Limitations']),
+    ('results without variance are left to retrieval',
+     paper(ABSTRACT, INTRODUCTION, ('5 Results', 'Our model is best on all entity types.')),
+     'C3', []),
+    ('results that report variance are routed to',
+     paper(ABSTRACT, INTRODUCTION, ('5 Results', 'Scores are averaged over 3 random seeds.')),
+     'C3', ['5 Results']),
+    ('keywords alone need ROUTING_MIN_KEYWORD_HITS of them',
+     paper(ABSTRACT, INTRODUCTION,
+           ('4 Setup', 'We train on one GPU.'),
+           ('5 Models', 'We train for 10 epochs with a learning rate of 1e-5 and a batch size of 16.')),
+     'C2', ['5 Models']),
+    ('A3 goes to the abstract and introduction',
+     paper(ABSTRACT, INTRODUCTION, ('2 Method', 'We fine-tune BERT.')),
+     'A3', ['abstract', '1 Introduction']),
+]
+
+def main():
+    for name, sections, key, expected in CASES:
+        routed = [node.node.node_id for node in SectionRouter(sections, max_sections=3, min_keyword_hits=2).route(key)]
+        assert routed == expected, f"{name}: {key} expected {expected}, got {routed}"
+        print(f"ok  {name}")
+
+if __name__ == "__main__":
+    main()
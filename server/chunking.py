@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Splitting paper sections into the smaller chunks that are embedded and retrieved.
+
+The 'semantic' policy runs every section through the semantic splitter, which embeds every sentence
+(with its neighbours) just to decide where to cut. The 'adaptive' policy leaves short sections
+(abstract, ethics statement, ...) whole, since the section itself is always indexed as well, and only
+splits long ones, either into sentence-aligned windows (no embedding calls at all) or semantically with
+the sentence embeddings of all long sections requested up front in full batches.
+"""
+
+from functools import lru_cache
+
+from llama_index.core.node_parser import SemanticSplitterNodeParser, SentenceSplitter
+from llama_index.core.utils import get_tokenizer
+
+from config import CHUNKING_POLICY, CHUNKING_SMALL_SECTION_TOKENS, CHUNKING_LONG_SECTION_SPLITTER, CHUNK_SIZE, CHUNK_OVERLAP
+
+CHUNKING_POLICIES = ('semantic', 'adaptive')
+LONG_SECTION_SPLITTERS = ('sentence', 'semantic')
+
+@lru_cache(maxsize=None)
+def sentence_splitter(chunk_size, chunk_overlap):
+    return SentenceSplitter(chunk_size=chunk_size,
+                            chunk_overlap=chunk_overlap,
+                            include_metadata=True,
+                            include_prev_next_rel=True)
+
+def split_long_sections(base_nodes, small_section_tokens, chunk_size, chunk_overlap):
+    """
+    Sentence-aligned windows of the sections with at least small_section_tokens tokens ([] for the others),
+    and which sections were split. Needs no embedding model, so it can run in a CPU worker process.
+    """
+    tokenizer = get_tokenizer()
+    split_flags = [len(tokenizer(node.get_content())) >= small_section_tokens for node in base_nodes]
+    splitter = sentence_splitter(chunk_size, chunk_overlap)
+    sub_nodes = [splitter.get_nodes_from_documents([node]) if split else []
+                 for node, split in zip(base_nodes, split_flags)]
+    return sub_nodes, split_flags
+
+class SectionChunker:
+    """
+    Turns the section nodes of a paper into the sub nodes indexed for retrieval.
+    """
+    def __init__(self, embed_model, policy=CHUNKING_POLICY, small_section_tokens=CHUNKING_SMALL_SECTION_TOKENS,
+                 long_section_splitter=CHUNKING_LONG_SECTION_SPLITTER, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+                 cpu_pool=None):
+        if policy not in CHUNKING_POLICIES:
+            raise ValueError(f"Unknown chunking policy {policy!r}, expected one of {CHUNKING_POLICIES}")
+        if long_section_splitter not in LONG_SECTION_SPLITTERS:
+            raise ValueError(f"Unknown splitter {long_section_splitter!r}, expected one of {LONG_SECTION_SPLITTERS}")
+
+        self.embed_model = embed_model
+        self.policy = policy
+        self.small_section_tokens = small_section_tokens
+        self.long_section_splitter = long_section_splitter
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.tokenizer = get_tokenizer()
+        # Sentence splitting runs here when no pool is given
+        self.cpu_pool = cpu_pool
+
+        self.semantic_splitter = SemanticSplitterNodeParser(buffer_size=1,
+                                                            breakpoint_percentile_threshold=95,
+                                                            embed_model=embed_model,
+                                                            include_metadata = True,
+                                                            include_prev_next_rel = True)
+
+    def describe(self):
+        """
+        The settings in effect, as reported in the pipeline metrics.
+        """
+        if self.policy == 'semantic':
+            return {'policy': 'semantic'}
+        return {'policy': 'adaptive',
+                'small_section_tokens': self.small_section_tokens,
+                'long_section_splitter': self.long_section_splitter}
+
+    def prefetch_sentence_embeddings(self, base_nodes):
+        """
+        Embeds the sentence groups the semantic splitter will ask for, for all sections at once.
+        The embedding model is cached, so the splitter then finds every vector it needs and the
+        paper costs full batches instead of one partial batch per section.
+        """
+        splitter = self.semantic_splitter
+        combined_sentences = []
+        for base_node in base_nodes:
+            sentence_groups = splitter._build_sentence_groups(splitter.sentence_splitter(base_node.get_content()))
+            combined_sentences.extend(group['combined_sentence'] for group in sentence_groups)
+        if combined_sentences:
+            self.embed_model.get_text_embedding_batch(combined_sentences)
+
+    def split(self, base_nodes):
+        """
+        Returns the sub nodes of every section ([] for sections indexed whole) and a summary for the metrics.
+        """
+        if self.policy == 'adaptive' and self.long_section_splitter == 'sentence':
+            args = (base_nodes, self.small_section_tokens, self.chunk_size, self.chunk_overlap)
+            sub_nodes, split_flags = (self.cpu_pool.run(split_long_sections, *args) if self.cpu_pool
+                                      else split_long_sections(*args))
+        else:
+            # The semantic splitter embeds sentences, so it stays with the embedding model in this process
+            if self.policy == 'semantic':
+                split_flags = [True] * len(base_nodes)
+            else:
+                split_flags = [len(self.tokenizer(node.get_content())) >= self.small_section_tokens for node in base_nodes]
+                self.prefetch_sentence_embeddings([node for node, split in zip(base_nodes, split_flags) if split])
+            sub_nodes = [self.semantic_splitter.get_nodes_from_documents([node]) if split else []
+                         for node, split in zip(base_nodes, split_flags)]
+
+        summary = dict(self.describe(),
+                       sections=len(base_nodes),
+                       split_sections=sum(split_flags),
+                       sub_nodes=sum(len(nodes) for nodes in sub_nodes))
+        return sub_nodes, summary
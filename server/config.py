@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Deployment settings for the ACLReady server.
+Every value can be overridden with an environment variable of the same name prefixed with ACLREADY_.
+"""
+
+import json
+import os
+
+## Inference
+
+# Number of checklist questions sent to the LLM at the same time (1 runs them one after another)
+MAX_CONCURRENT_QUERIES = int(os.getenv('ACLREADY_MAX_CONCURRENT_QUERIES', '4'))
+
+# Seconds a single checklist question may run before it is reported as failed
+QUERY_TIMEOUT = float(os.getenv('ACLREADY_QUERY_TIMEOUT', '120'))
+
+# 'question' sends every checklist question to the LLM on its own,
+# 'grouped' answers all questions of a checklist section (A, B, C, D) in a single call
+INFERENCE_MODE = os.getenv('ACLREADY_INFERENCE_MODE', 'question')
+
+# Size of the keep-alive connection pool shared by all LLM and embedding calls
+HTTP_MAX_CONNECTIONS = int(os.getenv('ACLREADY_HTTP_MAX_CONNECTIONS', '20'))
+
+# Requests and tokens per minute allowed for each model, as 'model=requests/tokens' separated by commas
+# (0 for no limit); requests over them wait on the client. Models that are not listed are not held back.
+# Requests answered with 429 or a 5xx are retried up to RATE_LIMIT_MAX_RETRIES times, waiting an exponential
+# backoff (RATE_LIMIT_BACKOFF_BASE seconds doubled per retry, at most RATE_LIMIT_BACKOFF_MAX) with jitter.
+RATE_LIMITS = {model.strip(): tuple(int(value) for value in limit.split('/', 1))
+               for model, limit in (item.split('=', 1) for item in os.getenv(
+                   'ACLREADY_RATE_LIMITS', 'gpt-3.5-turbo=3500/160000,text-embedding-ada-002=3000/1000000').split(',') if item.strip())}
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('ACLREADY_RATE_LIMIT_MAX_RETRIES', '5'))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv('ACLREADY_RATE_LIMIT_BACKOFF_BASE', '1'))
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv('ACLREADY_RATE_LIMIT_BACKOFF_MAX', '60'))
+
+# Worker processes for the CPU-bound stages (LaTeX preprocessing, sentence chunking), shared by all uploads;
+# 0 runs them on the upload's own thread
+CPU_WORKERS = int(os.getenv('ACLREADY_CPU_WORKERS', str(os.cpu_count() or 1)))
+
+## LLM
+
+# Backend that answers the checklist questions: 'openai' (gpt-3.5-turbo), 'openai-gpt-4o', 'together'
+# (Llama 3.1 70B) or 'local', any OpenAI-compatible server such as llama.cpp or vLLM (at http://127.0.0.1:8000/v1
+# by default). A request can ask for another backend with its 'llm' form field.
+LLM_BACKEND = os.getenv('ACLREADY_LLM_BACKEND', 'openai')
+
+# JSON object of backends to add, or of fields to change in the built-in ones (see llm_backends.py), e.g.
+# {"local": {"model": "qwen2.5-7b-instruct", "api_base": "http://gpu-box:8000/v1", "context_window": 32768}}
+LLM_BACKENDS = json.loads(os.getenv('ACLREADY_LLM_BACKENDS', '{}'))
+
+## Embeddings
+
+# 'openai', 'together' (Together's OpenAI-compatible API at TOGETHER_API_BASE) or 'local': a sentence-transformers
+# model (pip install sentence-transformers) loaded once per process. EMBEDDING_MODEL overrides the backend's default
+# model (text-embedding-ada-002, togethercomputer/m2-bert-80M-8k-retrieval, sentence-transformers/all-MiniLM-L6-v2).
+# The local model embeds LOCAL_EMBEDDING_BATCH_SIZE texts per forward pass on LOCAL_EMBEDDING_DEVICE with
+# LOCAL_EMBEDDING_THREADS threads (0 for the default), with the 'torch', 'onnx' or 'openvino' runtime.
+EMBEDDING_BACKEND = os.getenv('ACLREADY_EMBEDDING_BACKEND', 'openai')
+EMBEDDING_MODEL = os.getenv('ACLREADY_EMBEDDING_MODEL', '')
+TOGETHER_API_BASE = os.getenv('ACLREADY_TOGETHER_API_BASE', 'https://api.together.xyz/v1')
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv('ACLREADY_LOCAL_EMBEDDING_BATCH_SIZE', '32'))
+LOCAL_EMBEDDING_THREADS = int(os.getenv('ACLREADY_LOCAL_EMBEDDING_THREADS', '0'))
+LOCAL_EMBEDDING_DEVICE = os.getenv('ACLREADY_LOCAL_EMBEDDING_DEVICE', 'cpu')
+LOCAL_EMBEDDING_RUNTIME = os.getenv('ACLREADY_LOCAL_EMBEDDING_RUNTIME', 'torch')
+
+## Chunking
+
+# 'semantic' runs every section through the semantic splitter (one embedding per sentence),
+# 'adaptive' keeps sections shorter than CHUNKING_SMALL_SECTION_TOKENS whole and splits longer ones with
+# CHUNKING_LONG_SECTION_SPLITTER: 'sentence' (windows of CHUNK_SIZE tokens, no embedding calls) or 'semantic'
+CHUNKING_POLICY = os.getenv('ACLREADY_CHUNKING_POLICY', 'adaptive')
+CHUNKING_SMALL_SECTION_TOKENS = int(os.getenv('ACLREADY_CHUNKING_SMALL_SECTION_TOKENS', '512'))
+CHUNKING_LONG_SECTION_SPLITTER = os.getenv('ACLREADY_CHUNKING_LONG_SECTION_SPLITTER', 'sentence')
+CHUNK_SIZE = int(os.getenv('ACLREADY_CHUNK_SIZE', '256'))
+CHUNK_OVERLAP = int(os.getenv('ACLREADY_CHUNK_OVERLAP', '32'))
+
+## Retrieval
+
+# Chunks scored as best for a question; their sections (each once) become the question's context
+RETRIEVAL_TOP_K = int(os.getenv('ACLREADY_RETRIEVAL_TOP_K', '40'))
+
+# Questions with an obvious home in a paper (A1 in the Limitations section, D4 in the Ethics Statement, ...) are
+# routed straight to the sections whose titles or keywords match: at most ROUTING_MAX_SECTIONS of them, with a
+# section only counting on keywords alone if it has ROUTING_MIN_KEYWORD_HITS of them (see routing.py for the
+# generic titles that need a keyword too). Vector retrieval only runs for the questions that match no section.
+SECTION_ROUTING = os.getenv('ACLREADY_SECTION_ROUTING', 'true').lower() in ('1', 'true', 'yes')
+ROUTING_MAX_SECTIONS = int(os.getenv('ACLREADY_ROUTING_MAX_SECTIONS', '3'))
+ROUTING_MIN_KEYWORD_HITS = int(os.getenv('ACLREADY_ROUTING_MIN_KEYWORD_HITS', '2'))
+
+# Reranking of the retrieved sections: 'none', 'bm25' (lexical, local) or 'llm' (extra LLM calls), keeping the
+# best RERANK_TOP_N. RERANK_QUESTION_MODES overrides the mode per checklist question, e.g. 'A2=bm25,C2=llm'.
+# RERANK_CHOICE_BATCH_SIZE is the number of sections the LLM reranker shows the LLM at a time.
+RERANK_MODE = os.getenv('ACLREADY_RERANK_MODE', 'none')
+RERANK_QUESTION_MODES = dict(item.strip().split('=', 1) for item in os.getenv('ACLREADY_RERANK_QUESTION_MODES', '').split(',') if item.strip())
+RERANK_TOP_N = int(os.getenv('ACLREADY_RERANK_TOP_N', '5'))
+RERANK_CHOICE_BATCH_SIZE = int(os.getenv('ACLREADY_RERANK_CHOICE_BATCH_SIZE', '5'))
+
+## Synthesis
+
+# 'packed' answers every question in one LLM call over the best retrieved sections that fit CONTEXT_TOKEN_BUDGET
+# tokens (and the model's context window, less CONTEXT_OUTPUT_TOKENS for the answer), truncating the last one
+# if at least CONTEXT_MIN_TRUNCATED_TOKENS of it fit. 'tree_summarize' summarizes over all retrieved sections
+# in as many calls as they need. With CONTEXT_OVERFLOW 'tree_summarize', packed questions whose sections do not
+# fit fall back to tree_summarize instead of being truncated.
+SYNTHESIS_MODE = os.getenv('ACLREADY_SYNTHESIS_MODE', 'packed')
+CONTEXT_OVERFLOW = os.getenv('ACLREADY_CONTEXT_OVERFLOW', 'truncate')
+CONTEXT_TOKEN_BUDGET = int(os.getenv('ACLREADY_CONTEXT_TOKEN_BUDGET', '8000'))
+CONTEXT_OUTPUT_TOKENS = int(os.getenv('ACLREADY_CONTEXT_OUTPUT_TOKENS', '1024'))
+CONTEXT_MIN_TRUNCATED_TOKENS = int(os.getenv('ACLREADY_CONTEXT_MIN_TRUNCATED_TOKENS', '64'))
+
+# Ask the LLM backend for JSON output where it supports it (OpenAI-compatible chat models), and ask a question
+# again (with the error) up to ANSWER_RETRIES times when its answer cannot be parsed or is not valid
+STRUCTURED_OUTPUT_JSON_MODE = os.getenv('ACLREADY_STRUCTURED_OUTPUT_JSON_MODE', 'true').lower() in ('1', 'true', 'yes')
+ANSWER_RETRIES = int(os.getenv('ACLREADY_ANSWER_RETRIES', '1'))
+
+## Caching
+
+# Directory holding the on-disk caches (results, embeddings)
+CACHE_DIR = os.getenv('ACLREADY_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+# Cached checklist results are dropped once they are older than this many days,
+# or (least recently used first) once the cache grows past this many megabytes
+RESULT_CACHE_MAX_AGE_DAYS = float(os.getenv('ACLREADY_RESULT_CACHE_MAX_AGE_DAYS', '30'))
+RESULT_CACHE_MAX_MB = float(os.getenv('ACLREADY_RESULT_CACHE_MAX_MB', '256'))
+
+## Jobs
+
+# Number of uploads processed at the same time; further uploads wait in the job queue
+JOB_WORKERS = int(os.getenv('ACLREADY_JOB_WORKERS', '2'))
+
+# Seconds a finished job (and its result) stays available at /api/jobs/<id>
+JOB_RETENTION_SECONDS = float(os.getenv('ACLREADY_JOB_RETENTION_SECONDS', '3600'))
+
+# Uploads that may wait for a free job worker; further uploads are turned away with 429 and a Retry-After
+JOB_QUEUE_SIZE = int(os.getenv('ACLREADY_JOB_QUEUE_SIZE', '16'))
+
+## Serving
+
+# 'development' runs Flask's own server, 'production' serves with waitress (pip install waitress):
+# one process (jobs live in memory) with SERVER_THREADS request threads, CPU-bound stages in CPU_WORKERS processes
+SERVER_MODE = os.getenv('ACLREADY_SERVER_MODE', 'development')
+SERVER_HOST = os.getenv('ACLREADY_SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.getenv('ACLREADY_SERVER_PORT', '8080'))
+SERVER_THREADS = int(os.getenv('ACLREADY_SERVER_THREADS', '16'))
+
+## Batch
+
+# Worker processes of `python aclready.py batch`, each processing one paper at a time
+# (with up to MAX_CONCURRENT_QUERIES of its questions at the same time)
+BATCH_WORKERS = int(os.getenv('ACLREADY_BATCH_WORKERS', '4'))
+
+## Uploads
+
+# Limits on what an uploaded paper may contain: the total size of its .tex files (after decompression)
+# and the number of files in an archive (figures and data files included)
+UPLOAD_MAX_TEX_MB = float(os.getenv('ACLREADY_UPLOAD_MAX_TEX_MB', '20'))
+UPLOAD_MAX_ARCHIVE_MEMBERS = int(os.getenv('ACLREADY_UPLOAD_MAX_ARCHIVE_MEMBERS', '5000'))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Process pool for the CPU-bound stages of the pipeline: LaTeX preprocessing and sentence chunking.
+
+Python threads share one interpreter lock, so the regex and tokenizer work of concurrent uploads would
+otherwise slow every upload down, however many cores the server has. These stages run in worker processes
+instead, while the network-bound LLM and embedding calls stay on the job and question threads.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import threading
+
+from config import CPU_WORKERS
+
+def warm_up():
+    # Importing the pipeline modules once per worker, so the first upload does not pay for it
+    import chunking
+    import latex
+    return True
+
+class CpuPool:
+    """
+    Runs functions in a pool of worker processes, started on first use. With 0 workers functions run
+    in the calling thread (e.g. in the batch workers, which are separate processes already).
+    """
+    def __init__(self, workers=CPU_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Workers are spawned rather than forked, the server has HTTP clients and threads running
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def run(self, fn, *args):
+        """
+        fn(*args) in a worker process (fn and args must be picklable).
+        """
+        if self.workers <= 0:
+            return fn(*args)
+        pool = self._get_pool()
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory), the next call starts a new pool
+            logging.error("A CPU worker process died, restarting the pool")
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def start(self):
+        """
+        Starts every worker process up front.
+        """
+        if self.workers > 0:
+            pool = self._get_pool()
+            for future in [pool.submit(warm_up) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Embedding models used to chunk and index papers.
+
+The backend is chosen per deployment (EMBEDDING_BACKEND): 'openai', 'together' (or any other OpenAI-compatible
+/embeddings API) or 'local', a sentence-transformers model run on this machine, which takes the network round
+trips out of indexing altogether. Whatever the backend, vectors are cached by CachedEmbedding.
+"""
+
+from functools import lru_cache
+import logging
+import os
+import threading
+from typing import Any, List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+from cache import get_embedding_store, text_hash
+from config import EMBEDDING_BACKEND, EMBEDDING_MODEL, TOGETHER_API_BASE
+from config import LOCAL_EMBEDDING_BATCH_SIZE, LOCAL_EMBEDDING_THREADS, LOCAL_EMBEDDING_DEVICE, LOCAL_EMBEDDING_RUNTIME
+from metrics import record_embedding
+
+EMBEDDING_BACKENDS = ('openai', 'together', 'local')
+
+# Model of each backend when EMBEDDING_MODEL is not set
+DEFAULT_EMBEDDING_MODELS = {
+    # https://platform.openai.com/docs/guides/embeddings/what-are-embeddings
+    'openai': 'text-embedding-ada-002',
+    'together': 'togethercomputer/m2-bert-80M-8k-retrieval',
+    'local': 'sentence-transformers/all-MiniLM-L6-v2',
+}
+
+class OpenAICompatibleEmbedding(BaseEmbedding):
+    """
+    Any embedding API that follows OpenAI's /embeddings endpoint (Together, vLLM, llama.cpp, ...),
+    called with whole batches through the given HTTP client (which is rate limited, see ratelimit.py).
+    """
+    api_base: str
+    _api_key: str = PrivateAttr()
+    _http_client: Any = PrivateAttr()
+
+    def __init__(self, model_name: str, api_base: str, api_key: str, http_client, **kwargs: Any):
+        super().__init__(model_name=model_name, api_base=api_base, **kwargs)
+        self._api_key = api_key
+        self._http_client = http_client
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OpenAICompatibleEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embeddings([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        response = self._http_client.post(f"{self.api_base.rstrip('/')}/embeddings",
+                                          headers={'Authorization': f"Bearer {self._api_key}"},
+                                          json={'model': self.model_name, 'input': texts})
+        response.raise_for_status()
+        return [item['embedding'] for item in sorted(response.json()['data'], key=lambda item: item['index'])]
+
+_load_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def load_sentence_transformer(model_name, device, runtime, threads):
+    """
+    The sentence-transformers model, loaded once per process however many engines use it.
+    """
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError("EMBEDDING_BACKEND 'local' needs sentence-transformers: pip install sentence-transformers")
+    if threads > 0:
+        torch.set_num_threads(threads)
+    logging.info(f"Loading embedding model {model_name} on {device} ({runtime})")
+    kwargs = {} if runtime == 'torch' else {'backend': runtime}
+    return SentenceTransformer(model_name, device=device, **kwargs)
+
+class LocalEmbedding(BaseEmbedding):
+    """
+    A sentence-transformers model run in this process, embedding embed_batch_size texts per forward pass.
+    Vectors are normalized, like OpenAI's.
+    """
+    _model: Any = PrivateAttr()
+
+    def __init__(self, model_name: str, embed_batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE, device: str = LOCAL_EMBEDDING_DEVICE,
+                 runtime: str = LOCAL_EMBEDDING_RUNTIME, threads: int = LOCAL_EMBEDDING_THREADS, **kwargs: Any):
+        super().__init__(model_name=model_name, embed_batch_size=embed_batch_size, **kwargs)
+        with _load_lock:
+            self._model = load_sentence_transformer(model_name, device, runtime, threads)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalEmbedding"
+
+    def _encode(self, texts):
+        return self._model.encode(texts, batch_size=self.embed_batch_size, normalize_embeddings=True,
+                                  convert_to_numpy=True, show_progress_bar=False).tolist()
+
+    def warm_up(self):
+        # The first forward passes allocate the model's buffers, a full batch sizes them for real papers
+        self._encode(['warm up'] * self.embed_batch_size)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._encode([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts)
+
+def build_embed_model(http_client, backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL):
+    """
+    The embedding model of backend (without the cache), remote ones calling through http_client.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBEDDING_BACKENDS}")
+    model_name = model_name or DEFAULT_EMBEDDING_MODELS[backend]
+    if backend == 'openai':
+        # The client does not retry on its own, the rate limiter of http_client does
+        return OpenAIEmbedding(model=model_name, http_client=http_client, max_retries=0)
+    if backend == 'together':
+        return OpenAICompatibleEmbedding(model_name, TOGETHER_API_BASE, os.getenv('TOGETHERAI_API_KEY'), http_client)
+    return LocalEmbedding(model_name)
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model so that each text is embedded at most once per model.
+    Vectors live in the on-disk EmbeddingStore, so the semantic splitter and the vector index
+    of a revised paper only pay for the paragraphs that actually changed.
+    """
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _store: Any = PrivateAttr()
+    _model_key: str = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, store=None, **kwargs: Any):
+        super().__init__(model_name=embed_model.model_name,
+                         embed_batch_size=embed_model.embed_batch_size,
+                         callback_manager=embed_model.callback_manager,
+                         **kwargs)
+        self._embed_model = embed_model
+        self._store = store or get_embedding_store()
+        self._model_key = f"{embed_model.class_name()}:{embed_model.model_name}"
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def warm_up(self):
+        """
+        Runs a local model once before the first paper needs it (remote models need nothing).
+        """
+        warm_up = getattr(self._embed_model, 'warm_up', None)
+        if warm_up is not None:
+            warm_up()
+
+    def _lookup(self, kind, texts):
+        keys = [text_hash(f"{kind}|{text}") for text in texts]
+        found = self._store.get_many(self._model_key, keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        return keys, found, missing
+
+    def _merge(self, keys, found, missing, computed):
+        new_vectors = {keys[i]: vector for i, vector in zip(missing, computed)}
+        if new_vectors:
+            self._store.put_many(self._model_key, new_vectors)
+        found.update(new_vectors)
+        return [found[key] for key in keys]
+
+    def _embed(self, kind, texts, compute):
+        keys, found, missing = self._lookup(kind, texts)
+        computed = []
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            with record_embedding(missing_texts):
+                computed = compute(missing_texts)
+        return self._merge(keys, found, missing, computed)
+
+    async def _aembed(self, kind, texts, compute):
+        keys, found, missing = self._lookup(kind, texts)
+        computed = []
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            with record_embedding(missing_texts):
+                computed = await compute(missing_texts)
+        return self._merge(keys, found, missing, computed)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed('query', [query], lambda queries: [self._embed_model._get_query_embedding(q) for q in queries])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        async def compute(queries):
+            return [await self._embed_model._aget_query_embedding(q) for q in queries]
+        return (await self._aembed('query', [query], compute))[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed('text', texts, self._embed_model._get_text_embeddings)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed('text', texts, self._embed_model._aget_text_embeddings)
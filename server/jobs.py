@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory job subsystem: uploads are queued as jobs and processed by a bounded worker pool.
+Each job keeps its own event log, so concurrent users only ever see their own progress.
+The queue is bounded too: when it is full, submit() raises QueueFull with an estimate of when to retry.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import math
+import threading
+import time
+import uuid
+
+from config import JOB_WORKERS, JOB_RETENTION_SECONDS, JOB_QUEUE_SIZE
+
+# Number of recent jobs the Retry-After estimate is averaged over
+JOB_DURATION_SAMPLES = 20
+
+class QueueFull(Exception):
+    """
+    Every job worker is busy and the queue is full; retry_after is the estimated seconds until a place frees up.
+    """
+    def __init__(self, retry_after):
+        super().__init__(f"The server is busy, retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+class Job:
+    """
+    A single queued upload. Progress messages are appended to an event log that
+    any number of readers can replay and follow.
+    """
+    def __init__(self, on_progress=None):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self._on_progress = on_progress
+        self._condition = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def publish(self, event, data):
+        with self._condition:
+            self.events.append((event, data))
+            self._condition.notify_all()
+
+    def progress(self, message):
+        """
+        Progress callback handed to the pipeline.
+        """
+        self.publish('progress', message)
+        if self._on_progress is not None:
+            self._on_progress(message)
+
+    def finish(self, status, result=None, error=None):
+        with self._condition:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished = time.time()
+            self.events.append((status, error or ''))
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        with self._condition:
+            self._condition.wait_for(lambda: self.done, timeout)
+        return self.done
+
+    def follow(self, timeout=None):
+        """
+        Yields (event, data) pairs from the start of the log until the job has finished.
+        Yields None whenever nothing happened for timeout seconds, so streams can send keep-alives.
+        """
+        index = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: index < len(self.events) or self.done, timeout)
+                new_events = self.events[index:]
+                finished = self.done
+            if not new_events and not finished:
+                yield None
+                continue
+            for event in new_events:
+                yield event
+            index += len(new_events)
+            if finished and index >= len(self.events):
+                return
+
+    def to_dict(self, include_result=True):
+        info = {'id': self.id,
+                'status': self.status,
+                'created': self.created,
+                'started': self.started,
+                'finished': self.finished,
+                'progress': next((data for event, data in reversed(self.events) if event == 'progress'), None),
+                'error': self.error}
+        if include_result and self.status == 'done':
+            info['result'] = self.result
+        return info
+
+class JobManager:
+    """
+    Runs jobs on a bounded worker pool, with at most max_queued jobs waiting for a worker,
+    and keeps finished jobs for retention seconds.
+    """
+    def __init__(self, max_workers=JOB_WORKERS, retention=JOB_RETENTION_SECONDS, max_queued=JOB_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self.jobs = {}
+        self._durations = deque(maxlen=JOB_DURATION_SAMPLES)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='aclready-job')
+
+    def submit(self, fn, *args, on_progress=None, **kwargs):
+        """
+        Queues fn(*args, progress=job.progress, publish=job.publish, **kwargs) and returns the Job right away.
+        fn can publish events of its own (e.g. partial results) next to the progress messages.
+        Raises QueueFull if max_queued jobs are already waiting.
+        """
+        job = Job(on_progress=on_progress)
+        with self._lock:
+            self._cleanup()
+            if sum(1 for queued in self.jobs.values() if queued.status == 'queued') >= self.max_queued:
+                raise QueueFull(self._retry_after())
+            self.jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            result = fn(*args, progress=job.progress, publish=job.publish, **kwargs)
+        except Exception as e:
+            logging.error(f"Job {job.id} failed: {e}")
+            job.finish('failed', error=str(e))
+        else:
+            job.finish('done', result=result)
+        with self._lock:
+            self._durations.append(job.finished - job.started)
+
+    def _retry_after(self):
+        # A place in the queue frees up whenever one of the running jobs finishes.
+        # Until some job has finished, the longest running one is the best guess of how long jobs take.
+        if self._durations:
+            average = sum(self._durations) / len(self._durations)
+        else:
+            average = max([time.time() - job.started for job in self.jobs.values() if job.started and not job.done] or [1])
+        return max(1, math.ceil(average / max(1, self.max_workers)))
+
+    def _cleanup(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and job.finished < cutoff]:
+            del self.jobs[job_id]
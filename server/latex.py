@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+"""
+Turning a LaTeX paper into section chunks.
+
+The document is preprocessed in a single left-to-right scan over its tokens. The output is the same as
+that of the original chain of whole-document rewrites (documented step by step in LatexPreprocessor),
+but no step copies or re-scans the full text, and no pattern can backtrack over a large source.
+Only malformed LaTeX (a caption or float that is never closed, floats closed out of order) can come out
+differently; check_latex.py compares the two and lists those cases.
+"""
+
+import heapq
+import re
+
+# LaTeX commands that get spaces around them, since they can add spaces where non exist.
+# This is extremely important for LLMs to chunk.
+# The patterns were originally built as rf'(\\{command}\*?\{{.*?\}})', so 'section*' also matches '\sectio{' or '\sectionn{'.
+SPACED_COMMANDS = [
+    ('footnote', re.compile(r'footnote')),
+    ('href', re.compile(r'href')),
+    ('textbf', re.compile(r'textbf')),
+    ('section', re.compile(r'section')),
+    ('section*', re.compile(r'section*')),
+    ('subsection', re.compile(r'subsection')),
+    ('subsection*', re.compile(r'subsection*')),
+]
+
+# Everything the scanner has to look at: the commands and environments the rewrites care about and runs of %.
+# Text between two tokens is copied as is. The lookahead lets the regex engine skip straight to candidates.
+TOKEN_PATTERN = re.compile(r"""
+    (?=[\\%])
+    (?:
+        (?P<document>\\(?:begin|end)\{document\})
+      | (?P<environment>\\(?P<edge>begin|end)\{(?P<name>table|figure)\*?\})
+      | (?P<abstract>\\begin\{abstract\})
+      | (?P<command>\\(?P<word>footnote|href|textbf|(?:sub)?sectio(?:n*)|bibliography|title|caption)(?![A-Za-z])(?P<brace>\*?\{)?)
+      | (?P<percent>%+)
+    )
+""", re.VERBOSE)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# \title[short]{Title} in the preamble, allowing one level of braces inside the title
+SOURCE_TITLE_PATTERN = re.compile(r'\\title\s*(?:\[[^\]]*\])?\{((?:[^{}]|\{[^{}]*\})*)\}')
+ACKNOWLEDGEMENTS_PATTERN = re.compile(r'\\section\*?\{acknowledgements\}', re.IGNORECASE)
+
+class SectionNumberer:
+    """
+    When converting tex files to pdfs in overleaf, sections become numbered before appendix.
+    In the appendix, they are num
+    and during appendix they are lettered.
+    This function mimic that behavior by converting the sections
+    """
+    def __init__(self):
+        self.section_count = 0
+        self.subsection_count = 0
+        self.alpha_section_count = 0
+        self.bibliography_found = False  # Flag to track if bibliography has been found
+
+    def label(self, command):
+        """
+        Number of the next 'section' or 'subsection' heading, or None for 'bibliography'.
+        """
+
+        # If bibliography command is encountered, switch to alphabetic numbering
+        if command == 'bibliography':
+            self.bibliography_found = True
+            return None
+
+        # Process sections and subsections based on the numbering mode
+        if self.bibliography_found:
+            if command == 'section':
+                self.alpha_section_count += 1
+                self.subsection_count = 0  # Reset subsection count for new section
+                return chr(64 + self.alpha_section_count)  # Convert to letters A, B, C, etc.
+            elif command == 'subsection':
+                self.subsection_count += 1
+                return f"{chr(64 + self.alpha_section_count)}.{self.subsection_count}"
+        else:
+            if command == 'section':
+                self.section_count += 1
+                self.subsection_count = 0  # Reset subsection count
+                return f"{self.section_count}"
+            elif command == 'subsection':
+                self.subsection_count += 1
+                return f"{self.section_count}.{self.subsection_count}"
+
+class _Output:
+    """
+    Output buffer that collapses whitespace runs into a single space, strips both ends,
+    collapses runs of %% and hands the text up to the next '}' to anyone waiting for it.
+    """
+    def __init__(self):
+        self.parts = []
+        self.pending_space = False
+        self.pending_percent = 0
+        self.last_brace = -1  # Index in parts of the last piece containing '}'
+        self.waiting = []  # (start index in parts, callback) waiting for the next '}'
+
+    def space(self):
+        self.pending_space = True
+
+    def percent(self, count):
+        if self.pending_space:
+            self.flush()
+        self.pending_percent += count
+
+    def flush(self):
+        if self.pending_percent:
+            # '(%%)+' -> '%%', an odd % is left over
+            count = self.pending_percent
+            self.parts.append('%%' + '%' * (count % 2) if count > 1 else '%')
+            self.pending_percent = 0
+        if self.pending_space:
+            if self.parts:
+                self.parts.append(' ')
+            self.pending_space = False
+
+    def write(self, text):
+        if not text:
+            return
+        if text[0].isspace():
+            self.pending_space = True
+        trailing_space = text[-1].isspace()
+        text = ' '.join(text.split())
+        if text:
+            self.flush()
+            if '}' in text:
+                self._write_braced(text)
+            else:
+                self.parts.append(text)
+        if trailing_space:
+            self.pending_space = True
+
+    def _write_braced(self, text):
+        brace = text.index('}')
+        if brace:
+            self.parts.append(text[:brace])
+        waiting, self.waiting = self.waiting, []
+        for start, callback in waiting:
+            callback(''.join(self.parts[start:]))
+        self.parts.append(text[brace:])
+        self.last_brace = len(self.parts) - 1
+
+    def wait_for_brace(self, callback):
+        """
+        Calls callback with everything written from now until the next '}'.
+        """
+        self.flush()
+        self.waiting.append((len(self.parts), callback))
+
+    def mark(self):
+        """
+        Flushes pending text and returns the index of the next part.
+        """
+        self.flush()
+        return len(self.parts)
+
+    def placeholder(self):
+        """
+        Reserves an empty part that can be filled in later.
+        """
+        self.flush()
+        self.parts.append('')
+        return len(self.parts) - 1
+
+class _Environment:
+    """
+    A table or figure being removed. Only its first caption is kept.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.output = _Output()
+        self.caption = None
+        self.caption_started = False
+
+class LatexPreprocessor:
+    """
+    Single-pass version of the original preprocessing chain, which applied these rewrites one after another:
+
+    1. remove \\begin{document} and \\end{document}
+    2. put spaces around \\footnote, \\href, \\textbf, \\section and \\subsection commands, then collapse all whitespace
+    3. replace each table by 'Table N Description: <caption>. End Table N Description.' (nothing without a caption)
+    4. the same for figures
+    5. keep only the text from the first \\begin{abstract} on
+    6. drop the (by then single) line if it is a comment
+    7. collapse runs of %%
+    8. number sections and subsections (SectionNumberer)
+    9. split before every \\section, drop the acknowledgements and turn the abstract into the first section
+
+    Each rewrite only depends on text the earlier rewrites have already produced, so all of them can be applied
+    while the tokens go by: a step that needs to see ahead (up to the next '}' or the end of an environment)
+    waits for that text to be written instead of searching for it.
+    """
+    def __init__(self, tex_content):
+        self.source = tex_content
+        # Step 2: per command, the position where its previous match ended and the positions where a space goes
+        self.spaced_until = {name: 0 for name, _ in SPACED_COMMANDS}
+        self.space_positions = []
+        # Steps 3-4
+        self.environments = []
+        self.table_count = 0
+        self.figure_count = 0
+        self.environment_end_cache = {}
+        # Step 5
+        self.abstract_found = False
+        self._reset_document()
+        # Cached positions of the next '}' and newline in the source
+        self._next_cache = {}
+
+    def _reset_document(self):
+        """
+        Everything that only depends on the text from the abstract on (steps 5-9).
+        """
+        self.output = _Output()
+        self.numberer = SectionNumberer()
+        self.in_heading = False
+        self.section_starts = []
+        self.title = None
+        self.in_title = False
+
+    def _find_next(self, char, start):
+        cached = self._next_cache.get(char)
+        if cached is not None and cached[0] <= start <= cached[1]:
+            return cached[1]
+        position = self.source.find(char, start)
+        if position == -1:
+            position = len(self.source)
+        self._next_cache[char] = (start, position)
+        return position
+
+    def _is_document_tag_brace(self, position):
+        return (self.source.startswith('\\begin{document}', position - 15)
+                or self.source.startswith('\\end{document}', position - 13))
+
+    def _spaced_command_end(self, start):
+        """
+        End of '.*?\\}' from start (the first '}' on the same line, ignoring the removed document tags), or None.
+        """
+        newline = self._find_next('\n', start)
+        brace = self._find_next('}', start)
+        while brace < newline and self._is_document_tag_brace(brace):
+            brace = self._find_next('}', brace + 1)
+        if brace < newline and brace < len(self.source):
+            return brace + 1
+        return None
+
+    def _environment_has_end(self, name, start):
+        """
+        Whether a matching \\end{table} / \\end{figure} (starred or not) follows start.
+        """
+        cached = self.environment_end_cache.get(name)
+        if cached is not None and cached[0] <= start < cached[1]:
+            return True
+        if cached is not None and cached[1] == -1 and start >= cached[0]:
+            return False
+        end_pattern = re.compile(rf'\\end\{{{name}\*?\}}')
+        match = end_pattern.search(self.source, start)
+        self.environment_end_cache[name] = (start, match.start() if match else -1)
+        return match is not None
+
+    @property
+    def writer(self):
+        """
+        Where text currently goes: the innermost environment being removed, or the document.
+        """
+        return self.environments[-1].output if self.environments else self.output
+
+    def _write_source(self, start, end):
+        """
+        Copies source text, adding the pending spaces of step 2 that fall inside it.
+        """
+        positions = self.space_positions
+        while positions and positions[0] <= end:
+            position = heapq.heappop(positions)
+            if position > start:
+                self.writer.write(self.source[start:position])
+                start = position
+            self.writer.space()
+        self.writer.write(self.source[start:end])
+
+    def run(self):
+        source = self.source
+        position = 0
+        for token in TOKEN_PATTERN.finditer(source):
+            self._write_source(position, token.start())
+            position = token.end()
+
+            kind = token.lastgroup
+            if kind == 'document':
+                continue
+            elif kind == 'percent':
+                self.writer.percent(len(token.group()))
+            elif kind == 'command':
+                self._command(token)
+            elif kind == 'environment':
+                self._environment(token)
+            else:
+                self._abstract(token)
+        self._write_source(position, len(source))
+
+        return self._chunks()
+
+    def _command(self, token):
+        word = token.group('word')
+        brace = token.group('brace')
+
+        # Step 2
+        if brace is not None:
+            end = None
+            for name, pattern in SPACED_COMMANDS:
+                if token.start() >= self.spaced_until[name] and pattern.fullmatch(word):
+                    end = end or self._spaced_command_end(token.end())
+                    if end is None:
+                        break
+                    self.spaced_until[name] = end
+                    self.writer.space()
+                    heapq.heappush(self.space_positions, end)
+
+        text = token.group()
+        if word == 'section' and brace is not None and not self.environments:
+            # Step 9: a new chunk starts at every \section (kept only if a '}' follows)
+            self.section_starts.append(self.output.mark())
+
+        if brace != '{':
+            self.writer.write(text)
+            return
+
+        if self.environments:
+            # Steps 3-4: the first caption of a table or figure
+            environment = self.environments[-1]
+            self.writer.write(text)
+            if word == 'caption' and not environment.caption_started:
+                environment.caption_started = True
+                self.writer.wait_for_brace(lambda caption: setattr(environment, 'caption', caption))
+            return
+
+        self.output.write(text)
+
+        if word in ('section', 'subsection', 'bibliography') and not self.in_heading:
+            # Step 8
+            self.in_heading = True
+            label = self.numberer.label(word)
+            slot = self.output.placeholder() if label is not None else None
+
+            def number_heading(content):
+                self.in_heading = False
+                if slot is not None:
+                    self.output.parts[slot] = f"{label} "
+
+            self.output.wait_for_brace(number_heading)
+
+        elif word == 'title' and self.title is None and not self.in_title:
+            self.in_title = True
+
+            def set_title(content):
+                self.in_title = False
+                self.title = content
+
+            self.output.wait_for_brace(set_title)
+
+    def _environment(self, token):
+        name = token.group('name')
+        opening = token.group('edge') == 'begin'
+        in_table = any(environment.name == 'table' for environment in self.environments)
+
+        if opening and not in_table and (name == 'table' or not self.environments) \
+                and self._environment_has_end(name, token.end()):
+            self.writer.space()
+            self.environments.append(_Environment(name))
+            return
+
+        if not opening and self.environments and self.environments[-1].name == name:
+            environment = self.environments.pop()
+            # A caption still open swallows the '\end{...' of the environment, as '[^}]*' would
+            if environment.caption_started and environment.caption is None:
+                environment.output.write(token.group()[:-1])
+                environment.output.write('}')
+
+            if name == 'table':
+                self.table_count += 1 if environment.caption is not None else 0
+                count, label = self.table_count, 'Table'
+            else:
+                self.figure_count += 1 if environment.caption is not None else 0
+                count, label = self.figure_count, 'Figure'
+
+            self.writer.space()
+            if environment.caption is not None:
+                description = f'{label} {count} Description: {environment.caption}. End {label} {count} Description.'
+                self.writer.write(WHITESPACE_PATTERN.sub(' ', description))
+                self.writer.space()
+            return
+
+        self.writer.write(token.group())
+
+    def _abstract(self, token):
+        if not self.environments and not self.abstract_found:
+            # Step 5: everything before the first abstract is dropped
+            self.abstract_found = True
+            self._reset_document()
+        self.writer.write(token.group())
+
+    def _chunks(self):
+        output = self.output
+        output.pending_space = False
+        output.flush()
+        parts = output.parts
+
+        # Step 6: without an abstract, a document starting with a comment is a single commented line
+        if not self.abstract_found and parts and parts[0].startswith('%'):
+            return [''], ''
+
+        # Step 9: \section only starts a chunk if '[^}]*}' can match after it
+        starts = [start for start in self.section_starts if start < output.last_brace]
+        bounds = [0] + starts + [len(parts)]
+        list_chunks = [''.join(parts[begin:end]) for begin, end in zip(bounds, bounds[1:])]
+
+        # Filter out items starting with \section*{Acknowledgements} or \section{Acknowledgements} (case-insensitive)
+        list_chunks = [chunk for chunk in list_chunks if not ACKNOWLEDGEMENTS_PATTERN.match(chunk)]
+
+        # Replace \begin{abstract} with \section*{abstract}
+        list_chunks[0] = list_chunks[0].replace('\\begin{abstract}', '\\section*{abstract}')
+
+        # Replace \end{abstract} with an empty string
+        list_chunks[0] = list_chunks[0].replace('\\end{abstract}', '')
+
+        return list_chunks, self.title or ''
+
+def preprocess_latex(tex_content):
+    """
+    Returns the section chunks of the paper (starting from the abstract) and its title.
+    """
+    return LatexPreprocessor(tex_content).run()
+
+def extract_title(tex_content):
+    """
+    The \\title of the paper as written in its source (preprocess_latex only sees the text from the abstract on,
+    so its title is usually empty). Commented-out titles are skipped.
+    """
+    for match in SOURCE_TITLE_PATTERN.finditer(tex_content):
+        line_start = tex_content.rfind('\n', 0, match.start()) + 1
+        if '%' not in tex_content[line_start:match.start()].replace('\\%', ''):
+            return WHITESPACE_PATTERN.sub(' ', match.group(1)).strip()
+    return ''
+
+def read_latex_doc(filename):
+    """
+    Returns the section chunks of the paper (starting from the abstract) and its title.
+    """
+
+    with open(filename, 'r') as file:
+        tex_content = file.read()
+
+    return preprocess_latex(tex_content)
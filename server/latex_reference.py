@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+The LaTeX preprocessing as the original process_file.py did it, before it moved to latex.py: the functions
+below are copied from process_file() one indentation level out, with no other change. check_latex.py
+compares latex.py with them. Not used by the server.
+"""
+
+import re
+
+def send_update(message):
+    # The original posted progress to the web interface; the check has nobody to tell
+    pass
+
+class SectionNumberer:
+    """
+    When converting tex files to pdfs in overleaf, sections become numbered before appendix.
+    In the appendix, they are num
+    and during appendix they are lettered.
+    This function mimic that behavior by converting the sections
+    """
+    def __init__(self):
+        self.section_count = 0
+        self.subsection_count = 0
+        self.alpha_section_count = 0
+        self.bibliography_found = False  # Flag to track if bibliography has been found
+
+    def replace_heading(self, match):
+        command = match.group(1)  # 'section', 'subsection', or 'bibliography'
+        content = match.group(2)  # Title inside the braces
+
+        # If bibliography command is encountered, switch to alphabetic numbering
+        if command == 'bibliography':
+            self.bibliography_found = True
+            return match.group(0)  # Optionally return the bibliography line unchanged
+
+        # Process sections and subsections based on the numbering mode
+        if self.bibliography_found:
+            if command == 'section':
+                self.alpha_section_count += 1
+                section_label = chr(64 + self.alpha_section_count)  # Convert to letters A, B, C, etc.
+                self.subsection_count = 0  # Reset subsection count for new section
+                return f"\\section{{{section_label} {content}}}"
+            elif command == 'subsection':
+                self.subsection_count += 1
+                subsection_label = f"{chr(64 + self.alpha_section_count)}.{self.subsection_count}"
+                return f"\\subsection{{{subsection_label} {content}}}"
+        else:
+            if command == 'section':
+                self.section_count += 1
+                self.subsection_count = 0  # Reset subsection count
+                return f"\\section{{{self.section_count} {content}}}"
+            elif command == 'subsection':
+                self.subsection_count += 1
+                return f"\\subsection{{{self.section_count}.{self.subsection_count} {content}}}"
+
+    def number_sections(self, tex_content):
+        # Regex to find all section, subsection, or bibliography commands
+        pattern = re.compile(r"\\(section|subsection|bibliography)\{([^}]*)\}")
+        processed_content = pattern.sub(self.replace_heading, tex_content)
+        return processed_content
+
+def extract_text_and_captions_table(latex_string):
+    """
+    Remove tables, but keep the table captions (they are numbered).
+    """
+
+    # Regex to find all table environments (both \begin{table*} and \begin{table})
+    table_pattern = re.compile(r'(\\begin\{table\*?\}.*?\\end\{table\*?\})', re.DOTALL)
+
+    # Split the text at each table environment
+    parts = table_pattern.split(latex_string)
+
+    result_parts = []
+    caption_counter = 1
+
+    for part in parts:
+        if table_pattern.match(part):
+            # Find the caption within this table
+            caption_match = re.search(r'\\caption\{([^}]*)\}', part)
+            if caption_match:
+                caption_text = caption_match.group(1)
+                result_parts.append(f'Table {caption_counter} Description: {caption_text}. End Table {caption_counter} Description.')
+                caption_counter += 1
+        else:
+            result_parts.append(part)
+
+    # Combine the extracted text parts and captions
+    combined_text = ' '.join(result_parts)
+
+    # Clean up any extra spaces introduced
+    clean_text = re.sub(r'\s+', ' ', combined_text).strip()
+
+    return clean_text
+
+def extract_text_and_captions_figure(latex_string):
+    """
+    Remove figures, but keep the figure captions (they are numbered).
+    """
+
+    # Regex to find all figure environments (both \begin{figure*} and \begin{figure})
+    table_pattern = re.compile(r'(\\begin\{figure\*?\}.*?\\end\{figure\*?\})', re.DOTALL)
+
+    # Split the text at each figure environment
+    parts = table_pattern.split(latex_string)
+
+    result_parts = []
+    caption_counter = 1
+
+    for part in parts:
+        if table_pattern.match(part):
+            # Find the caption within this figure
+            caption_match = re.search(r'\\caption\{([^}]*)\}', part)
+            if caption_match:
+                caption_text = caption_match.group(1)
+                result_parts.append(f'Figure {caption_counter} Description: {caption_text}. End Figure {caption_counter} Description.')
+                caption_counter += 1
+        else:
+            result_parts.append(part)
+
+    # Combine the extracted text parts and captions
+    combined_text = ' '.join(result_parts)
+
+    # Clean up any extra spaces introduced
+    clean_text = re.sub(r'\s+', ' ', combined_text).strip()
+
+    return clean_text
+
+def read_latex_doc(filename):
+
+    send_update("Parsing Latex Information")
+
+    with open(filename, 'r') as file:
+        tex_content = file.read()
+
+    def extract_title(tex_content):
+        """
+        This is meant to go to the source in all nodes
+        """
+
+        # Regex pattern to match text within \title{...}
+        pattern = re.compile(r'\\title\{([^}]*)\}')
+        result = pattern.search(tex_content)
+        return result.group(1) if result else ''
+
+    def remove_document_tags(tex_content):
+        """
+        Remove \begin{document} and \end{document} from LaTeX content.
+        """
+        tex_content = re.sub(r'\\begin{document}', '', tex_content)
+        tex_content = re.sub(r'\\end{document}', '', tex_content)
+        return tex_content
+
+    def start_with_abstract(tex_content):
+        """
+        Keep only the content starting from \begin{abstract}.
+        """
+        match = re.search(r'\\begin{abstract}', tex_content)
+        if match:
+            tex_content = tex_content[match.start():]
+        return tex_content
+
+    def remove_comments(tex_content):
+        """
+        Remove commented lines from LaTeX content while preserving original line endings.
+        """
+        lines = re.split('(\r\n|\r|\n)', tex_content)  # Capture the line endings
+        uncommented_lines = [line for line in lines if not line.strip().startswith('%') and not re.match(r'(\r\n|\r|\n)', line)]
+        line_endings = [line for line in lines if re.match(r'(\r\n|\r|\n)', line)]
+
+        # Reconstruct the text preserving line endings
+        uncommented_text = ''.join(uncommented_lines + line_endings)
+        return uncommented_text
+
+    def add_spaces_around_commands(text, commands):
+        for command in commands:
+            # Create a regular expression pattern for each command, including optional *
+            pattern = rf'(\\{command}\*?\{{.*?\}})'
+
+            # Add spaces around each matched command pattern
+            text = re.sub(pattern, r' \1 ', text)
+
+        # Remove any duplicate spaces that may have been introduced
+        text = re.sub(r'\s+', ' ', text).strip()
+
+        return text
+
+    def remove_consecutive_occurrences(line):
+        # Use a regular expression to replace consecutive occurrences of %%
+        # Some people use multiple line strings
+        return re.sub(r'(%%)+', r'\1', line)
+
+    def number_sections(tex_content):
+        section_count = 0
+        appendix_mode = False
+        alpha_section_count = 0
+        subsection_count = 0  # Initialize subsection count
+
+        def replace_heading(match):
+            nonlocal section_count, alpha_section_count, appendix_mode, subsection_count
+            heading_type = match.group(1)  # Determine whether it's 'section' or 'subsection'
+            heading_content = match.group(2)  # Capture the title inside the braces
+
+            if "\\appendix" in heading_content:
+                appendix_mode = True
+                return match.group(0)  # Return the original line
+
+            if heading_type == 'section':
+                if appendix_mode:
+                    alpha_section_count += 1
+                    section_label = chr(64 + alpha_section_count)
+                    subsection_count = 0  # Reset subsection count
+                    return f"\\section{{{section_label}. {heading_content}}}"
+                else:
+                    section_count += 1
+                    subsection_count = 0  # Reset subsection count
+                    return f"\\section{{{section_count}. {heading_content}}}"
+            elif heading_type == 'subsection':
+                if appendix_mode:
+                    subsection_count += 1
+                    subsection_label = f"{chr(64 + alpha_section_count)}.{subsection_count}"
+                    return f"\\subsection{{{subsection_label}. {heading_content}}}"
+                else:
+                    subsection_count += 1
+                    return f"\\subsection{{{section_count}.{subsection_count}. {heading_content}}}"
+
+        # Regex to find all section and subsection commands
+        pattern = re.compile(r"\\(section|subsection)\{([^}]*)\}")
+        processed_content = pattern.sub(replace_heading, tex_content)
+        return processed_content
+
+    def split_sections(tex_content):
+        send_update("Performing semantic chunking")
+        # Split using lookahead to ensure \section starts a new chunk
+        # This splits before each \section{...}
+        chunks = re.split(r'(?=\\section\*?{[^}]*})', tex_content)
+
+        # Initialize list to store properly combined chunks
+        combined_chunks = []
+
+        # Append the first chunk directly as it includes content before any \section
+        if chunks and not chunks[0].startswith('\\section'):
+            combined_chunks.append(chunks.pop(0))
+
+        # Remaining chunks should already start with \section
+        combined_chunks.extend(chunks)
+
+        return combined_chunks
+
+    # Remove \begin{document} and \end{document}
+    tex_content = remove_document_tags(tex_content)
+
+    # List of LaTeX commands to handle that can add spaces where non exist. This is extremely important for LLMs to chunk.
+    commands = ['footnote', 'href', 'textbf', 'section', 'section*', 'subsection', 'subsection*']
+
+    tex_content = add_spaces_around_commands(tex_content, commands)
+
+    # Remove most of table content except caption.
+    tex_content = extract_text_and_captions_table(tex_content)
+
+    # Remove most of table content except caption.
+    tex_content = extract_text_and_captions_figure(tex_content)
+
+    # Start with \begin{abstract}
+    tex_content = start_with_abstract(tex_content)
+
+    # Remove commented lines
+    tex_content = remove_comments(tex_content)
+
+    # Remove multiple line comments.
+    tex_content = remove_consecutive_occurrences(tex_content)
+
+    # Create an instance of SectionNumberer and process the LaTeX content
+    numberer = SectionNumberer()
+    tex_content = numberer.number_sections(tex_content)
+
+    list_chunks = split_sections(tex_content)
+
+    # Regex pattern to match strings starting with \section*{Acknowledgements} or \section{Acknowledgements} (case-insensitive)
+    pattern = re.compile(r'\\section\*?\{acknowledgements\}', re.IGNORECASE)
+
+    # Filter out items that match the pattern
+    list_chunks = [chunk for chunk in list_chunks if not pattern.match(chunk)]
+
+    # Replace \begin{abstract} with \section*{abstract}
+    list_chunks[0] = list_chunks[0].replace('\\begin{abstract}', '\\section*{abstract}')
+
+    # Replace \end{abstract} with an empty string
+    list_chunks[0] = list_chunks[0].replace('\\end{abstract}', '')
+
+    # Extract the title content
+    title = extract_title(tex_content)
+
+    return(list_chunks, title)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+The LLMs the checklist can be answered with.
+
+Every backend speaks OpenAI's chat API: OpenAI itself, Together, or a server on this machine or network such
+as llama.cpp (llama-server) or vLLM. Besides where to reach it, a backend sets how many requests it is sent at
+the same time, its context window, the timeout of one request and what its tokens cost, so a deployment can
+trade latency for cost by switching LLM_BACKEND (or a request by naming another backend).
+"""
+
+from collections import namedtuple
+import os
+
+from llama_index.llms.openai import OpenAI
+from llama_index.llms.openai_like import OpenAILike
+
+from config import LLM_BACKEND, LLM_BACKENDS
+from metrics import MODEL_PRICES
+
+# kind is 'openai' (OpenAI's own API, whose model metadata llama_index knows) or 'openai_like' (any other
+# OpenAI-compatible API at api_base). api_key_env names the environment variable holding the key (None for
+# servers without one). prices are USD per million (prompt, completion) tokens.
+LLMBackend = namedtuple('LLMBackend', ['name', 'kind', 'model', 'api_base', 'api_key_env', 'context_window',
+                                       'max_concurrency', 'timeout', 'prices', 'json_mode'])
+
+BUILTIN_BACKENDS = {
+    # https://openai.com/api/pricing/
+    'openai': LLMBackend('openai', 'openai', 'gpt-3.5-turbo', None, 'OPENAI_API_KEY', 16385, 16, 120, (0.50, 1.50), True),
+    'openai-gpt-4o': LLMBackend('openai-gpt-4o', 'openai', 'gpt-4o-2024-05-13', None, 'OPENAI_API_KEY', 128000, 16, 120,
+                                (5.00, 15.00), True),
+    # https://www.together.ai/pricing
+    'together': LLMBackend('together', 'openai_like', 'meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo',
+                           'https://api.together.xyz/v1', 'TOGETHERAI_API_KEY', 131072, 8, 120, (0.88, 0.88), True),
+    # llama.cpp (llama-server --port 8000) or vLLM (vllm serve <model>); both serve whatever model they were
+    # started with, and a CPU answers a few requests at a time at most, slowly
+    'local': LLMBackend('local', 'openai_like', 'local-model', 'http://127.0.0.1:8000/v1', None, 8192, 2, 600,
+                        (0.0, 0.0), True),
+}
+
+def load_backends(overrides=LLM_BACKENDS):
+    """
+    The built-in backends with overrides ({name: {field: value}}) applied; names that are not built in
+    add a backend, with the fields of 'local' as defaults.
+    """
+    backends = dict(BUILTIN_BACKENDS)
+    for name, fields in overrides.items():
+        base = backends.get(name, BUILTIN_BACKENDS['local'])
+        fields = dict(fields)
+        if 'prices' in fields:
+            fields['prices'] = tuple(fields['prices'])
+        backends[name] = base._replace(name=name, **fields)
+    return backends
+
+BACKENDS = load_backends()
+
+def backend_label(backend):
+    """
+    How caches and metrics name the LLM: the backend and its model, e.g. 'together:meta-llama/...'.
+    """
+    return f"{backend.name}:{backend.model}"
+
+# Costs are looked up by label, so the same model served by two backends is charged at each one's prices
+MODEL_PRICES.update({backend_label(backend): backend.prices for backend in BACKENDS.values()})
+
+def get_backend(name=None):
+    name = name or LLM_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]
+
+def describe_backends():
+    # What the web interface may offer, without keys
+    return {'default': LLM_BACKEND,
+            'backends': [{'name': backend.name, 'model': backend.model, 'context_window': backend.context_window,
+                          'prices': backend.prices} for backend in BACKENDS.values()]}
+
+def build_llm(backend, http_client):
+    """
+    The llama_index LLM of backend, sending its requests through http_client (which rate limits and retries them,
+    so the client itself does not retry).
+    """
+    # Local servers accept any key, but the OpenAI client wants one
+    api_key = os.getenv(backend.api_key_env) if backend.api_key_env else 'none'
+    if backend.kind == 'openai':
+        return OpenAI(api_key=api_key, api_base=backend.api_base, temperature=0, model=backend.model, chunk_size_limit=2048,
+                      timeout=backend.timeout, max_retries=0, http_client=http_client)
+    return OpenAILike(api_key=api_key, api_base=backend.api_base, temperature=0, model=backend.model,
+                      context_window=backend.context_window, is_chat_model=True, timeout=backend.timeout,
+                      max_retries=0, http_client=http_client)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Load test of the server's job API under concurrent uploads.
+
+Serves the app in this process (with waitress, as in production, or Flask's own server) on the fake LLM and
+hash embeddings of benchmark.py, so no network access or API key is needed. --clients clients then each upload
+--uploads distinct papers to /api/jobs, waiting Retry-After seconds whenever the server answers 429, and follow
+each job until it is done. This is repeated for every --cpu-workers value to show how throughput scales with
+the processes given to the CPU-bound stages:
+
+    python loadtest.py
+    python loadtest.py --cpu-workers 0 1 2 4 8 --clients 16 --size 4 --llm-latency 0.5 --json loadtest.json
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import httpx
+
+import app as server
+from benchmark import EXAMPLES_DIR, build_engine, generate_paper
+from cpu_pool import CpuPool
+from jobs import JobManager
+import process_file
+
+# Seconds between polls of a running job
+POLL_INTERVAL = 0.1
+
+def unique_paper(tex_content, number):
+    """
+    tex_content with a title and an abstract sentence of its own, so no upload is answered from the result cache
+    or treated as a revision of another one.
+    """
+    tex_content = tex_content.replace('\\title{', f"\\title{{Submission {number}: ", 1)
+    return tex_content.replace('\\begin{abstract}', f"\\begin{{abstract}}\nLoad test submission {number}.\n", 1)
+
+def start_server(kind, threads):
+    """
+    Serves the app on a free local port from a background thread. Returns (base URL, stop function).
+    """
+    if kind == 'waitress':
+        import waitress
+        httpd = waitress.create_server(server.app, host='127.0.0.1', port=0, threads=threads)
+        thread = threading.Thread(target=httpd.run, daemon=True)
+        stop = httpd.close
+        port = httpd.effective_port
+    else:
+        from werkzeug.serving import make_server
+        httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        stop = httpd.shutdown
+        port = httpd.server_port
+    thread.start()
+    return f"http://127.0.0.1:{port}", stop
+
+def upload(client, base_url, name, tex_content):
+    """
+    Submits one paper (retrying after every 429) and waits for its job.
+    Returns (status, seconds from the first attempt to the result, number of 429 answers).
+    """
+    start = time.perf_counter()
+    rejected = 0
+    while True:
+        response = client.post(f"{base_url}/api/jobs", files={'file': (name, tex_content.encode('utf-8'))})
+        if response.status_code != 429:
+            break
+        rejected += 1
+        time.sleep(float(response.headers.get('Retry-After', 1)))
+    if response.status_code != 202:
+        return 'rejected', time.perf_counter() - start, rejected
+
+    status_url = base_url + response.json()['status_url']
+    while True:
+        status = client.get(status_url).json()['status']
+        if status in ('done', 'failed'):
+            return status, time.perf_counter() - start, rejected
+        time.sleep(POLL_INTERVAL)
+
+def run_level(args, cpu_workers, tex_content):
+    """
+    Runs the whole load (every client's uploads) with cpu_workers CPU processes on a fresh engine and job queue.
+    """
+    cache_dir = tempfile.mkdtemp(prefix='aclready-loadtest-')
+    cpu_pool = CpuPool(workers=cpu_workers)
+    cpu_pool.start()
+    process_file._engine = build_engine(args, cache_dir, cpu_pool)
+    server.job_manager = JobManager(max_workers=args.job_workers, max_queued=args.queue_size)
+    base_url, stop = start_server(args.server, args.server_threads)
+
+    def client_run(client_number):
+        outcomes = []
+        with httpx.Client(timeout=None) as client:
+            for i in range(args.uploads):
+                number = client_number * args.uploads + i
+                outcomes.append(upload(client, base_url, f"paper{number}.tex", unique_paper(tex_content, number)))
+        return outcomes
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            outcomes = [outcome for outcomes in pool.map(client_run, range(args.clients)) for outcome in outcomes]
+        seconds = time.perf_counter() - start
+    finally:
+        stop()
+        cpu_pool.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    latencies = sorted(latency for status, latency, _ in outcomes if status == 'done')
+    return {'cpu_workers': cpu_workers,
+            'uploads': len(outcomes),
+            'done': len(latencies),
+            'failed': sum(1 for status, _, _ in outcomes if status != 'done'),
+            'rejected_429': sum(rejected for _, _, rejected in outcomes),
+            'seconds': seconds,
+            'papers_per_minute': len(latencies) / seconds * 60,
+            'latency_p50': statistics.median(latencies) if latencies else None,
+            'latency_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None}
+
+def print_report(levels):
+    header = ['CPU workers', 'uploads', 'done', 'failed', '429s', 'seconds', 'papers/min', 'p50 s', 'p95 s', 'speedup']
+    base = levels[0]['papers_per_minute'] or 1
+    rows = [[str(level['cpu_workers']), str(level['uploads']), str(level['done']), str(level['failed']),
+             str(level['rejected_429']), f"{level['seconds']:.2f}", f"{level['papers_per_minute']:.1f}",
+             '-' if level['latency_p50'] is None else f"{level['latency_p50']:.2f}",
+             '-' if level['latency_p95'] is None else f"{level['latency_p95']:.2f}",
+             f"{level['papers_per_minute'] / base:.2f}x"]
+            for level in levels]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+    print()
+    print(f"{os.cpu_count()} cores. Speedup is relative to the first row.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the job API with concurrent uploads, a fake LLM and hash embeddings.')
+    parser.add_argument('--cpu-workers', type=int, nargs='*', default=sorted({0, 1, os.cpu_count() or 1}),
+                        help='CPU worker process counts to compare (0 runs the CPU-bound stages on the job threads)')
+    parser.add_argument('--clients', type=int, default=8, help='Clients uploading at the same time')
+    parser.add_argument('--uploads', type=int, default=4, help='Papers uploaded by every client, one after another')
+    parser.add_argument('--paper', default='FiNER.tex', help='Example paper (or path to a .tex file) every upload is made from')
+    parser.add_argument('--size', type=int, default=4, help='Repeat the body of the paper this many times (see benchmark.py)')
+    parser.add_argument('--server', choices=['waitress', 'flask'], default='waitress', help='WSGI server to serve the app with')
+    parser.add_argument('--server-threads', type=int, default=16, help='Request threads of the server')
+    parser.add_argument('--job-workers', type=int, default=8, help='Uploads processed at the same time')
+    parser.add_argument('--queue-size', type=int, default=4, help='Uploads that may wait for a job worker before 429s')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Seconds per LLM call')
+    parser.add_argument('--embedding-latency', type=float, default=0.05, help='Seconds per embedding request')
+    parser.add_argument('--dimensions', type=int, default=256, help='Size of the fake embedding vectors')
+    parser.add_argument('--json', help='Also write the measurements to this file')
+    args = parser.parse_args()
+    # build_engine() reads these
+    args.no_routing = False
+    args.rerank = 'none'
+    args.llm = None
+
+    path = args.paper if os.path.exists(args.paper) else os.path.join(EXAMPLES_DIR, args.paper)
+    with open(path, 'r') as file:
+        tex_content = generate_paper(file.read(), args.size) if args.size > 1 else file.read()
+
+    levels = [run_level(args, cpu_workers, tex_content) for cpu_workers in args.cpu_workers]
+    print_report(levels)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'levels': levels, 'settings': vars(args)}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
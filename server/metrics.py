@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Per-stage time, call, token and cost accounting for the checklist pipeline.
+
+Every paper gets a PipelineMetrics; code runs inside metrics.stage(name) and LLM/embedding calls made
+while a stage is active are booked to it. The current stage lives in a context variable, so worker threads
+started with contextvars.copy_context() keep booking to the paper that started them.
+Totals over all papers since startup are served in Prometheus text format at /api/metrics.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import contextvars
+import threading
+import time
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events.llm import LLMChatEndEvent, LLMCompletionEndEvent
+from llama_index.core.utils import get_tokenizer
+
+# USD per million (prompt, completion) tokens, https://openai.com/api/pricing/
+# The LLM backends add their own prices (see llm_backends.py). Models missing here are counted with a cost of 0.
+MODEL_PRICES = {
+    'text-embedding-ada-002': (0.10, 0.0),
+}
+
+COUNTERS = ('seconds', 'llm_calls', 'embedding_calls', 'prompt_tokens', 'completion_tokens', 'embedding_tokens', 'cost')
+
+# (PipelineMetrics, stage name, question key) of the code currently running
+_current_stage = contextvars.ContextVar('aclready_current_stage', default=None)
+
+def estimate_tokens(text):
+    return len(get_tokenizer()(text))
+
+def token_cost(model_name, prompt_tokens, completion_tokens=0):
+    prompt_price, completion_price = MODEL_PRICES.get(model_name, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+class MetricsRegistry:
+    """
+    Process-wide totals of every finished paper, rendered for Prometheus.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.papers = 0
+        self.stages = OrderedDict()
+
+    def add(self, pipeline_metrics):
+        with self._lock:
+            self.papers += 1
+            for name, counters in pipeline_metrics.stages.items():
+                totals = self.stages.setdefault(name, dict.fromkeys(COUNTERS, 0))
+                for counter, value in counters.items():
+                    totals[counter] += value
+
+    def render_prometheus(self):
+        with self._lock:
+            lines = ['# HELP aclready_papers_total Papers processed since startup.',
+                     '# TYPE aclready_papers_total counter',
+                     f'aclready_papers_total {self.papers}']
+            for counter in COUNTERS:
+                name = 'aclready_stage_cost_usd_total' if counter == 'cost' else f'aclready_stage_{counter}_total'
+                lines.append(f'# HELP {name} Pipeline {counter.replace("_", " ")} by stage since startup.')
+                lines.append(f'# TYPE {name} counter')
+                for stage, totals in self.stages.items():
+                    lines.append(f'{name}{{stage="{stage}"}} {totals[counter]:g}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+class PipelineMetrics:
+    """
+    Counters of a single paper, by pipeline stage and by checklist question.
+    Seconds of stages that run concurrently (rerank, synthesis) are summed over the questions.
+    """
+    def __init__(self, llm_model_name, embedding_model_name):
+        self.llm_model_name = llm_model_name
+        self.embedding_model_name = embedding_model_name
+        self.stages = OrderedDict()
+        self.questions = OrderedDict()
+        # Non-numeric facts about the run (e.g. the chunking policy), returned as they are
+        self.details = OrderedDict()
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.total_seconds = None
+
+    def add(self, stage, question=None, **counts):
+        with self._lock:
+            targets = [self.stages.setdefault(stage, dict.fromkeys(COUNTERS, 0))]
+            if question is not None:
+                targets.append(self.questions.setdefault(question, dict.fromkeys(COUNTERS, 0)))
+            for target in targets:
+                for counter, value in counts.items():
+                    target[counter] += value
+
+    @contextmanager
+    def stage(self, name, question=None):
+        token = _current_stage.set((self, name, question))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, question, seconds=time.perf_counter() - start)
+            _current_stage.reset(token)
+
+    def finish(self):
+        """
+        Stops the clock and adds the paper to the process-wide totals.
+        """
+        self.total_seconds = time.perf_counter() - self._start
+        registry.add(self)
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            totals = {counter: sum(stage[counter] for stage in self.stages.values()) for counter in COUNTERS}
+            totals['seconds'] = self.total_seconds
+            return {'llm': self.llm_model_name,
+                    'embedding_model': self.embedding_model_name,
+                    'stages': {name: dict(counters) for name, counters in self.stages.items()},
+                    'questions': {key: dict(counters) for key, counters in self.questions.items()},
+                    'total': totals,
+                    **self.details}
+
+@contextmanager
+def record_embedding(texts):
+    """
+    Books an embedding request for texts (time, one call, estimated tokens) to the 'embedding' stage
+    of the paper being processed. Cache hits never get here, so only billed requests are counted.
+    """
+    current = _current_stage.get()
+    start = time.perf_counter()
+    yield
+    if current is None:
+        return
+    pipeline_metrics, _, question = current
+    tokens = sum(estimate_tokens(text) for text in texts)
+    pipeline_metrics.add('embedding', question,
+                         seconds=time.perf_counter() - start,
+                         embedding_calls=1,
+                         embedding_tokens=tokens,
+                         cost=token_cost(pipeline_metrics.embedding_model_name, tokens))
+
+def response_token_counts(response, prompt_text, completion_text):
+    """
+    (prompt tokens, completion tokens) reported by the provider, estimated with the tokenizer when it reports none.
+    """
+    raw = getattr(response, 'raw', None)
+    usage = raw.get('usage') if isinstance(raw, dict) else getattr(raw, 'usage', None)
+    if isinstance(usage, dict):
+        usage = (usage.get('prompt_tokens'), usage.get('completion_tokens'))
+    elif usage is not None:
+        usage = (getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None))
+    if usage and usage[0] is not None:
+        return usage[0], usage[1] or 0
+    return estimate_tokens(prompt_text), estimate_tokens(completion_text or '')
+
+class LLMUsageHandler(BaseEventHandler):
+    """
+    Books every finished LLM call to the stage that made it.
+    """
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMUsageHandler"
+
+    def handle(self, event, **kwargs):
+        if not isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)):
+            return
+        current = _current_stage.get()
+        if current is None or event.response is None:
+            return
+        pipeline_metrics, stage, question = current
+        if isinstance(event, LLMChatEndEvent):
+            prompt_text = '\n'.join(str(message.content) for message in event.messages)
+            completion_text = event.response.message.content
+        else:
+            prompt_text = event.prompt
+            completion_text = event.response.text
+        prompt_tokens, completion_tokens = response_token_counts(event.response, prompt_text, completion_text)
+        pipeline_metrics.add(stage, question,
+                             llm_calls=1,
+                             prompt_tokens=prompt_tokens,
+                             completion_tokens=completion_tokens,
+                             cost=token_cost(pipeline_metrics.llm_model_name, prompt_tokens, completion_tokens))
+
+get_dispatcher().add_event_handler(LLMUsageHandler())
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Packing the retrieved sections of a checklist question into one LLM call.
+
+tree_summarize answers over every retrieved section, resending section text in several LLM calls
+when it does not fit the context window. The packer instead keeps the best sections that fit a token
+budget (highest score first, each text once) and truncates the last one at the budget, so every question
+costs exactly one completion call.
+"""
+
+from llama_index.core.schema import MetadataMode
+from llama_index.core.utils import get_tokenizer
+
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_OUTPUT_TOKENS, CONTEXT_MIN_TRUNCATED_TOKENS
+
+# Sections are joined like tree_summarize joins its chunks
+SEPARATOR = "\n\n"
+
+def truncate_to_tokens(text, max_tokens, tokenizer):
+    """
+    Longest prefix of text (cut at a whitespace) with at most max_tokens tokens.
+    """
+    tokens = len(tokenizer(text))
+    while tokens > max_tokens and text:
+        cut = max(1, int(len(text) * max_tokens / tokens * 0.95))
+        space = text.rfind(' ', 0, cut)
+        text = text[:space if space > 0 else cut]
+        tokens = len(tokenizer(text))
+    return text
+
+class ContextPacker:
+    """
+    Turns the retrieved nodes of a question into the context string of a single completion call.
+    """
+    def __init__(self, context_window, token_budget=CONTEXT_TOKEN_BUDGET, output_tokens=CONTEXT_OUTPUT_TOKENS,
+                 min_truncated_tokens=CONTEXT_MIN_TRUNCATED_TOKENS):
+        self.context_window = context_window
+        self.token_budget = token_budget
+        self.output_tokens = output_tokens
+        self.min_truncated_tokens = min_truncated_tokens
+        self.tokenizer = get_tokenizer()
+
+    def describe(self):
+        return {'token_budget': self.token_budget, 'output_tokens': self.output_tokens,
+                'min_truncated_tokens': self.min_truncated_tokens}
+
+    def budget(self, prompt_text):
+        """
+        Context tokens available next to prompt_text (the query and the prompt template) and the answer.
+        """
+        available = self.context_window - len(self.tokenizer(prompt_text)) - self.output_tokens
+        return max(0, min(self.token_budget, available))
+
+    def pack(self, nodes, prompt_text):
+        """
+        Returns the context string and a summary: nodes given, nodes packed (whole or truncated),
+        context tokens, and whether anything was cut off.
+        """
+        budget = self.budget(prompt_text)
+        separator_tokens = len(self.tokenizer(SEPARATOR))
+
+        texts = []
+        for node in sorted(nodes, key=lambda node: node.score or 0, reverse=True):
+            text = node.node.get_content(metadata_mode=MetadataMode.LLM).strip()
+            # A chunk that is part of a section already packed (or the same text twice) adds nothing
+            if text and not any(text in packed for packed in texts):
+                texts.append(text)
+
+        packed = []
+        used = 0
+        truncated = False
+        for text in texts:
+            remaining = budget - used - (separator_tokens if packed else 0)
+            tokens = len(self.tokenizer(text))
+            if tokens <= remaining:
+                packed.append(text)
+                used += tokens + (separator_tokens if len(packed) > 1 else 0)
+                continue
+            truncated = True
+            if remaining >= self.min_truncated_tokens:
+                text = truncate_to_tokens(text, remaining, self.tokenizer)
+                packed.append(text)
+                used += len(self.tokenizer(text)) + (separator_tokens if len(packed) > 1 else 0)
+            break
+
+        return SEPARATOR.join(packed), {'nodes': len(nodes),
+                                        'packed': len(packed),
+                                        'tokens': used,
+                                        'truncated': truncated}
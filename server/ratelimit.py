@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Client-side rate limiting and retries for every LLM and embedding request of the process.
+
+All OpenAI-compatible requests go through the shared HTTP client, whose transport is a RateLimitedTransport:
+before a request is sent it waits for its model's token buckets (requests and tokens per minute), and a
+request answered with 429 or a 5xx is retried with exponential backoff and jitter. A 429 pauses the model
+for every thread, not just the one that got it. Waiting requests are served in priority order, so uploads
+from the web interface go ahead of batch jobs (see request_priority). A model can also be given a number of
+requests that may be in flight at once (set_concurrency), e.g. for a local server that answers one at a time.
+"""
+
+from contextlib import contextmanager
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+
+import httpx
+
+from config import RATE_LIMITS, RATE_LIMIT_MAX_RETRIES, RATE_LIMIT_BACKOFF_BASE, RATE_LIMIT_BACKOFF_MAX
+
+INTERACTIVE = 0
+BATCH = 1
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Errors where the request never reached the provider, so sending it again is safe
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+# Rough token count of request text before it is sent (the bucket is corrected with the actual usage after)
+CHARS_PER_TOKEN = 4
+
+_priority = contextvars.ContextVar('aclready_request_priority', default=INTERACTIVE)
+
+@contextmanager
+def request_priority(priority):
+    """
+    Requests made inside the block (and in threads started with a copy of its context) wait with this priority.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def text_tokens(value):
+    if isinstance(value, str):
+        return len(value) // CHARS_PER_TOKEN + 1
+    if isinstance(value, list):
+        # A list of token IDs counts as its length
+        if value and all(isinstance(item, int) for item in value):
+            return len(value)
+        return sum(text_tokens(item) for item in value)
+    if isinstance(value, dict):
+        return text_tokens(value.get('content') or value.get('text') or '')
+    return 0
+
+def request_tokens(body):
+    """
+    Tokens a chat, completion or embedding request will be counted for: its input and the most it may generate.
+    """
+    tokens = text_tokens(body.get('messages') or body.get('prompt') or body.get('input') or '')
+    return tokens + (body.get('max_tokens') or body.get('max_completion_tokens') or 0)
+
+class TokenBucket:
+    """
+    Holds up to per_minute units and refills at per_minute per minute. Taking more than is there leaves a debt
+    that later requests wait out, so requests larger than the bucket still go through.
+    """
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+class ModelLimit:
+    """
+    Buckets and waiting queue of one model.
+    """
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self.waiting = []
+
+    def wait_time(self, tokens, now):
+        waits = [self.paused_until - now]
+        if self.requests:
+            waits.append(self.requests.wait_time(1, now))
+        if self.tokens:
+            waits.append(self.tokens.wait_time(tokens, now))
+        return max(waits)
+
+class RateLimiter:
+    """
+    Requests and tokens per minute for each model in limits ({model: (requests, tokens)}, 0 for no limit).
+    Models that are not listed are only retried, never held back.
+    """
+    def __init__(self, limits=None, max_retries=RATE_LIMIT_MAX_RETRIES, backoff_base=RATE_LIMIT_BACKOFF_BASE,
+                 backoff_max=RATE_LIMIT_BACKOFF_MAX):
+        self.limits = dict(RATE_LIMITS if limits is None else limits)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.models = {model: ModelLimit(*limit) for model, limit in self.limits.items()}
+        self.concurrency = {}
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def scale(self, factor):
+        """
+        Gives this process factor of every limit, e.g. 1 / workers when worker processes share one account.
+        """
+        with self._condition:
+            self.models = {model: ModelLimit(requests and max(1, int(requests * factor)), tokens and max(1, int(tokens * factor)))
+                           for model, (requests, tokens) in self.limits.items()}
+
+    def set_concurrency(self, model, limit):
+        """
+        At most limit requests for model are sent at the same time (None or 0 for no limit).
+        """
+        self.concurrency[model] = (limit, threading.BoundedSemaphore(limit)) if limit else None
+
+    @contextmanager
+    def slot(self, model):
+        """
+        Holds one of model's concurrent request slots for the block.
+        """
+        concurrency = self.concurrency.get(model)
+        if concurrency is None:
+            yield
+            return
+        start = time.monotonic()
+        with concurrency[1]:
+            with self._condition:
+                self.throttled_seconds += time.monotonic() - start
+            yield
+
+    def describe(self):
+        return {'limits': self.limits, 'retries': self.retries, 'throttled_seconds': round(self.throttled_seconds, 3),
+                'concurrency': {model: concurrency[0] for model, concurrency in self.concurrency.items() if concurrency}}
+
+    def acquire(self, model, tokens):
+        """
+        Blocks until model has room for one request of tokens tokens, serving waiting requests in priority order.
+        """
+        limit = self.models.get(model)
+        if limit is None:
+            return
+        ticket = (_priority.get(), next(self._sequence))
+        start = time.monotonic()
+        with self._condition:
+            heapq.heappush(limit.waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = limit.wait_time(tokens, now) if limit.waiting[0] == ticket else None
+                    if wait is not None and wait <= 0:
+                        if limit.requests:
+                            limit.requests.take(1, now)
+                        if limit.tokens:
+                            limit.tokens.take(tokens, now)
+                        heapq.heappop(limit.waiting)
+                        self.throttled_seconds += now - start
+                        return
+                    self._condition.wait(wait)
+            finally:
+                if ticket in limit.waiting:
+                    limit.waiting.remove(ticket)
+                    heapq.heapify(limit.waiting)
+                self._condition.notify_all()
+
+    def correct(self, model, tokens):
+        """
+        Books tokens more (or, if negative, fewer) than were estimated when the request was let through.
+        """
+        limit = self.models.get(model)
+        if limit is None or not limit.tokens or not tokens:
+            return
+        with self._condition:
+            limit.tokens.take(tokens, time.monotonic())
+            self._condition.notify_all()
+
+    def pause(self, model, seconds):
+        """
+        Holds back every request for model for seconds (the provider said it is over its limit).
+        Returns False for a model without limits, whose requests are not held back here.
+        """
+        limit = self.models.get(model)
+        if limit is None:
+            return False
+        with self._condition:
+            limit.paused_until = max(limit.paused_until, time.monotonic() + seconds)
+        return True
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Seconds to wait before retry number attempt (from 0): exponential with full jitter, at least retry_after.
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+def retry_after_seconds(response):
+    value = response.headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    try:
+        return float(response.headers.get('retry-after', ''))
+    except ValueError:
+        return None
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """
+    httpx transport that passes every request through a RateLimiter before handing it to transport.
+    """
+    def __init__(self, transport, limiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    def handle_request(self, request):
+        try:
+            body = json.loads(request.content) if request.content else {}
+        except (ValueError, UnicodeDecodeError):
+            body = {}
+        model = body.get('model') if isinstance(body, dict) else None
+        if model is None:
+            return self.transport.handle_request(request)
+        estimated = request_tokens(body)
+
+        attempt = 0
+        while True:
+            self.limiter.acquire(model, estimated)
+            try:
+                with self.limiter.slot(model):
+                    response = self.transport.handle_request(request)
+                    if not body.get('stream'):
+                        # The server is busy with the request until the whole answer is read
+                        response.read()
+            except RETRY_ERRORS as e:
+                if attempt >= self.limiter.max_retries:
+                    raise
+                delay = self.limiter.backoff(attempt)
+                logging.warning(f"{model} request failed ({e}), retrying in {delay:.1f} s")
+                paused = False
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.limiter.max_retries:
+                    if response.status_code == 200 and not body.get('stream'):
+                        used = self.usage(response)
+                        if used:
+                            self.limiter.correct(model, used - estimated)
+                    return response
+                response.close()
+                delay = self.limiter.backoff(attempt, retry_after_seconds(response))
+                logging.warning(f"{model} request got {response.status_code}, retrying in {delay:.1f} s")
+                # Over the provider's limit: every request for the model waits, in acquire()
+                paused = response.status_code == 429 and self.limiter.pause(model, delay)
+            self.limiter.retries += 1
+            attempt += 1
+            if not paused:
+                time.sleep(delay)
+
+    @staticmethod
+    def usage(response):
+        response.read()
+        try:
+            return json.loads(response.content).get('usage', {}).get('total_tokens')
+        except (ValueError, AttributeError):
+            return None
+
+    def close(self):
+        self.transport.close()
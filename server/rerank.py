@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Reranking the sections retrieved for a checklist question before they go to the LLM.
+
+'none' keeps the retrieved order, 'bm25' rescores the sections lexically against the question (locally,
+no API call) and 'llm' asks the LLM to pick the relevant sections (LLMRerank, extra LLM calls per batch).
+The mode can be set per checklist question; an LLM rerank that fails falls back to BM25, and BM25 to none.
+"""
+
+from collections import Counter
+import logging
+import math
+import re
+
+from llama_index.core.postprocessor import LLMRerank
+from llama_index.core.schema import NodeWithScore
+
+from config import RERANK_MODE, RERANK_QUESTION_MODES, RERANK_TOP_N, RERANK_CHOICE_BATCH_SIZE
+
+RERANK_MODES = ('none', 'bm25', 'llm')
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+class BM25Rerank:
+    """
+    Okapi BM25 of every node against the query, with document frequencies taken over the nodes themselves.
+    """
+    def __init__(self, top_n=RERANK_TOP_N, k1=1.5, b=0.75):
+        self.top_n = top_n
+        self.k1 = k1
+        self.b = b
+
+    def postprocess_nodes(self, nodes, query_bundle):
+        if not nodes:
+            return nodes
+        documents = [Counter(tokenize(node.node.get_content())) for node in nodes]
+        lengths = [sum(document.values()) for document in documents]
+        average_length = sum(lengths) / len(lengths) or 1
+        query_terms = set(tokenize(query_bundle.query_str))
+
+        idf = {}
+        for term in query_terms:
+            frequency = sum(1 for document in documents if term in document)
+            if frequency:
+                idf[term] = math.log(1 + (len(documents) - frequency + 0.5) / (frequency + 0.5))
+
+        scores = []
+        for document, length in zip(documents, lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / average_length)
+            scores.append(sum(weight * document[term] * (self.k1 + 1) / (document[term] + norm)
+                              for term, weight in idf.items() if term in document))
+
+        ranked = sorted(range(len(nodes)), key=lambda i: scores[i], reverse=True)[:self.top_n]
+        return [NodeWithScore(node=nodes[i].node, score=scores[i]) for i in ranked]
+
+# What a failing reranker falls back to.
+# LLMRerank fails when the LLM's choice cannot be parsed, https://github.com/run-llama/llama_index/issues/11093
+FALLBACK_MODES = {'llm': 'bm25', 'bm25': 'none'}
+
+class Reranker:
+    """
+    Reranks the context of each checklist question with the mode configured for it.
+    """
+    def __init__(self, llm, mode=RERANK_MODE, question_modes=None, top_n=RERANK_TOP_N,
+                 choice_batch_size=RERANK_CHOICE_BATCH_SIZE):
+        question_modes = RERANK_QUESTION_MODES if question_modes is None else question_modes
+        for value in [mode] + list(question_modes.values()):
+            if value not in RERANK_MODES:
+                raise ValueError(f"Unknown rerank mode {value!r}, expected one of {RERANK_MODES}")
+
+        self.mode = mode
+        self.question_modes = dict(question_modes)
+        self.top_n = top_n
+        self.rerankers = {'bm25': BM25Rerank(top_n=top_n),
+                          'llm': LLMRerank(llm=llm, choice_batch_size=choice_batch_size, top_n=top_n)}
+
+    def mode_for(self, key):
+        return self.question_modes.get(key, self.mode)
+
+    def describe(self):
+        return {'mode': self.mode, 'question_modes': self.question_modes, 'top_n': self.top_n}
+
+    def rerank(self, key, nodes, query_bundle):
+        """
+        Returns the reranked nodes and the mode that produced them (after any fallback).
+        """
+        mode = self.mode_for(key)
+        while mode != 'none' and len(nodes) > 1:
+            try:
+                reranked = self.rerankers[mode].postprocess_nodes(nodes, query_bundle)
+                if not reranked:
+                    raise ValueError("no node was chosen")
+                return reranked, mode
+            except Exception as e:
+                logging.warning(f"Rerank issue for {key} ({mode}): {e}")
+                mode = FALLBACK_MODES[mode]
+        return nodes, 'none'
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental re-evaluation of revised papers.
+
+The last version of every paper (recognized by its title) is remembered in the result cache: a hash of each
+section and, for every checklist answer, the sections it was answered from. When a revised version comes in,
+sections are compared with the stored ones, and an answer is carried over when its question is given exactly
+the same sections as before, none of them changed, and the answer still names valid sections. Only the other
+questions go to the LLM. Sections that did not change are not embedded again either, since their embeddings
+are in the embedding cache.
+
+Sections are told apart by their title and, when several sections share a title (two "Results" sections,
+say), by which of them they are: the second one is "Results#2". Each of them is hashed and compared on its own.
+"""
+
+import json
+from collections import Counter, OrderedDict
+
+from answers import AnswerError, validate_answer
+from cache import normalize_chunk, text_hash
+from prompts import PROMPT_INSTRUCTION, QUESTION_PROMPTS
+
+FRESH = 'fresh'
+CARRIED_OVER = 'carried_over'
+
+def revision_key(title, model_name):
+    return text_hash(f"revision|{model_name}|{normalize_chunk(title)}")
+
+def section_ids(base_nodes):
+    """
+    The id of every section: its title, followed by #2, #3... for later sections with the same title.
+    """
+    occurrences = Counter()
+    ids = []
+    for node in base_nodes:
+        occurrences[node.node_id] += 1
+        count = occurrences[node.node_id]
+        ids.append(node.node_id if count == 1 else f"{node.node_id}#{count}")
+    return ids
+
+def settings_hash(settings):
+    """
+    Answers are only carried over between versions processed with the same questions and pipeline settings.
+    """
+    return text_hash(json.dumps({'settings': settings,
+                                 'questions': list(QUESTION_PROMPTS.values()),
+                                 'instruction': PROMPT_INSTRUCTION}, sort_keys=True))
+
+class PaperRevision:
+    """
+    The version of a paper being processed, compared with the previous one (a stored record or None).
+    """
+    def __init__(self, previous, base_nodes, settings_hash):
+        self.settings_hash = settings_hash
+        ids = section_ids(base_nodes)
+        # Retrieved and routed nodes are the base node objects themselves, whose node_id is only their title
+        self.node_ids = {id(node): section_id for node, section_id in zip(base_nodes, ids)}
+        self.sections = OrderedDict((section_id, text_hash(normalize_chunk(node.get_content())))
+                                    for node, section_id in zip(base_nodes, ids))
+        self.previous = previous if previous and previous.get('settings') == settings_hash else None
+
+        previous_sections = self.previous['sections'] if self.previous else {}
+        self.changed_sections = [name for name, digest in self.sections.items() if previous_sections.get(name) != digest]
+        self.removed_sections = [name for name in previous_sections if name not in self.sections]
+        self.answers = {}
+        self.freshness = {}
+
+    def context_ids(self, nodes):
+        """
+        The ids of the sections a question was given (nodes as retrieved, NodeWithScore).
+        """
+        return [self.node_ids.get(id(node.node), node.node.node_id) for node in nodes]
+
+    def reusable_answer(self, key, context_ids, valid_section_names):
+        """
+        The previous answer to question key if it was given the same, unchanged sections (else None).
+        """
+        if self.previous is None:
+            return None
+        previous = self.previous['answers'].get(key)
+        if previous is None or previous['context'] != context_ids:
+            return None
+        changed = set(self.changed_sections)
+        if any(section in changed for section in context_ids):
+            return None
+        try:
+            return validate_answer(previous['answer'], valid_section_names)
+        except AnswerError:
+            return None
+
+    def record(self, key, context_ids, answer, freshness):
+        self.answers[key] = {'context': list(context_ids), 'answer': dict(answer)}
+        self.freshness[key] = freshness
+
+    def to_record(self):
+        return {'settings': self.settings_hash, 'sections': self.sections, 'answers': self.answers}
+
+    def summary(self, keys):
+        return {'previous_version': self.previous is not None,
+                'changed_sections': self.changed_sections if self.previous else [],
+                'removed_sections': self.removed_sections,
+                'fresh': [key for key in keys if self.freshness.get(key) == FRESH],
+                'carried_over': [key for key in keys if self.freshness.get(key) == CARRIED_OVER]}
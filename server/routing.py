@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Routing checklist questions straight to the sections that answer them.
+
+Many questions have an obvious home in a paper: A1 in the Limitations section, A3 in the abstract and
+introduction, D4 in the Ethics Statement, C2 in the experimental setup or an appendix on training details.
+Every question has title rules (matched against section names) and keywords (counted in the section text).
+A question gets the sections whose title matches, then the sections with the most keyword hits, up to
+max_sections. Generic titles (Data, Results, Experiments) only count for a section that also mentions one of
+the keywords, so a question whose sections merely share a word with its topic is not kept from the part of
+the paper that answers it. Questions no section matches are left to vector retrieval.
+"""
+
+from collections import OrderedDict, namedtuple
+import re
+
+from llama_index.core.schema import NodeWithScore
+
+from cache import text_hash
+from config import ROUTING_MAX_SECTIONS, ROUTING_MIN_KEYWORD_HITS
+
+# titles and keywords are regular expressions matched case-insensitively at the start of a word,
+# loose_titles are titles too generic to go by alone (a 'Training Data' section for B1): a section whose name
+# only matches one of them is routed to if it also mentions one of the keywords.
+# leading_sections routes to the first sections of the paper (the abstract and introduction for A3)
+Route = namedtuple('Route', ['titles', 'keywords', 'leading_sections', 'loose_titles'], defaults=[(), (), 0, ()])
+
+ANNOTATION_TITLES = (r'annotat', r'crowd', r'human eval', r'participant')
+SETUP_TITLES = (r'experiment', r'setup', r'implementation', r'training', r'fine-?tuning')
+
+ROUTES = OrderedDict()
+ROUTES['A1'] = Route(titles=(r'limitation',), keywords=(r'limitation',))
+ROUTES['A2'] = Route(titles=(r'ethic', r'broader impact', r'societal impact'), loose_titles=(r'risk',),
+                     keywords=(r'risks?\b', r'harm', r'misuse', r'dual use', r'malicious'))
+ROUTES['A3'] = Route(leading_sections=2)
+ROUTES['B1'] = Route(titles=(r'(?:scientific )?artifacts?\b',), loose_titles=(r'datasets?\b', r'corp(?:us|ora)\b', r'resources?\b'),
+                     keywords=(r'released by', r'publicly available', r'proposed by', r'introduced by', r'created by',
+                               r'collected by'))
+ROUTES['B2'] = Route(titles=(r'licen[cs]', r'copyright'),
+                     keywords=(r'licen[cs]e', r'cc[- ]by', r'copyright', r'terms of (?:use|service)', r'apache', r'mit licen'))
+ROUTES['B3'] = Route(titles=(r'licen[cs]', r'copyright', r'intended use'),
+                     keywords=(r'intended use', r'research purposes', r'non-?commercial', r'licen[cs]e'))
+ROUTES['B4'] = Route(titles=(r'privacy', r'anonymi'), loose_titles=(r'personal',),
+                     keywords=(r'anonymi[sz]', r'personal(?:ly)? identifiable', r'pii\b', r'offensive', r'privacy', r'toxic'))
+ROUTES['B5'] = Route(titles=(r'data(?:set)? (?:statement|card|documentation)',), loose_titles=(r'documentation',),
+                     keywords=(r'domains?\b', r'demographic', r'coverage', r'english', r'genre'))
+ROUTES['B6'] = Route(titles=(r'data(?:set)? statistic', r'data split'), loose_titles=(r'statistic',),
+                     keywords=(r'train(?:ing)? set', r'test set', r'dev(?:elopment)? set', r'validation set', r'splits?\b'))
+ROUTES['C1'] = Route(titles=(r'computational (?:budget|cost|resources)', r'infrastructure'),
+                     loose_titles=SETUP_TITLES + (r'comput',),
+                     keywords=(r'gpus?\b', r'parameters\b', r'gpu hours', r'nvidia', r'computational budget'))
+ROUTES['C2'] = Route(titles=(r'hyper-?parameter',), loose_titles=SETUP_TITLES,
+                     keywords=(r'hyper-?parameter', r'learning rate', r'batch size', r'epochs?\b', r'early stopping'))
+ROUTES['C3'] = Route(loose_titles=(r'result', r'evaluation', r'robust'),
+                     keywords=(r'standard deviation', r'error bars?', r'random seeds?', r'confidence interval', r'averaged? over'))
+ROUTES['C4'] = Route(loose_titles=(r'implementation',),
+                     keywords=(r'nltk', r'spacy', r'rouge', r'hugging ?face', r'pytorch', r'tensorflow', r'scikit', r'sklearn'))
+ROUTES['D1'] = Route(titles=ANNOTATION_TITLES + (r'guideline', r'instruction'),
+                     keywords=(r'annotation guide', r'guidelines', r'instructions', r'screenshot'))
+ROUTES['D2'] = Route(titles=(r'annotator', r'crowd', r'participant', r'recruit'),
+                     keywords=(r'recruit', r'paid\b', r'payment', r'wage', r'compensat', r'mechanical turk', r'prolific', r'upwork'))
+ROUTES['D3'] = Route(titles=(r'consent',),
+                     keywords=(r'consent',))
+ROUTES['D4'] = Route(titles=(r'ethic', r'review board', r'irb\b'),
+                     keywords=(r'ethics review', r'review board', r'irb\b', r'exempt'))
+ROUTES['D5'] = Route(titles=(r'annotator', r'demographic', r'data statement'),
+                     keywords=(r'demographic', r'native speakers?', r'gender', r'nationality', r'background'))
+
+def word_pattern(alternatives):
+    return re.compile(r'\b(?:' + '|'.join(alternatives) + ')', re.IGNORECASE) if alternatives else None
+
+ROUTE_PATTERNS = {key: (word_pattern(route.titles), word_pattern(route.loose_titles), word_pattern(route.keywords))
+                  for key, route in ROUTES.items()}
+
+class SectionRouter:
+    """
+    Finds the sections of one paper that each checklist question is routed to.
+    """
+    def __init__(self, sections, max_sections=ROUTING_MAX_SECTIONS, min_keyword_hits=ROUTING_MIN_KEYWORD_HITS):
+        self.sections = list(sections)
+        self.max_sections = max_sections
+        self.min_keyword_hits = min_keyword_hits
+
+    def describe(self):
+        return {'max_sections': self.max_sections,
+                'min_keyword_hits': self.min_keyword_hits,
+                'rules': text_hash(repr(list(ROUTES.items())))}
+
+    def route(self, key):
+        """
+        The sections routed to for question key (as NodeWithScore, best first), [] when none match.
+        """
+        route = ROUTES.get(key)
+        if route is None:
+            return []
+        if route.leading_sections:
+            return [NodeWithScore(node=node, score=1.0) for node in self.sections[:route.leading_sections]]
+
+        title_pattern, loose_title_pattern, keyword_pattern = ROUTE_PATTERNS[key]
+        candidates = []
+        for position, node in enumerate(self.sections):
+            hits = len(keyword_pattern.findall(node.get_content())) if keyword_pattern else 0
+            title_match = bool(title_pattern and title_pattern.search(node.node_id)) \
+                or bool(hits and loose_title_pattern and loose_title_pattern.search(node.node_id))
+            if title_match or hits >= self.min_keyword_hits:
+                candidates.append((title_match, hits, -position))
+
+        candidates.sort(reverse=True)
+        return [NodeWithScore(node=self.sections[-position], score=1.0)
+                for _, _, position in candidates[:self.max_sections]]
+
+    def route_all(self, keys):
+        return OrderedDict((key, self.route(key)) for key in keys)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+A local stand-in for the OpenAI API, for trying rate limiting and retries without an account or network access.
+
+It answers /v1/chat/completions with a fixed valid checklist answer and /v1/embeddings with hash vectors,
+and can be told to answer the first requests with 429 and a Retry-After header. Every request is logged with
+the time it arrived, so a check can see how fast requests actually reached the "provider":
+
+    python stub_openai.py --port 8100 --fail-first 3
+    OPENAI_API_KEY=sk-stub OPENAI_API_BASE=http://127.0.0.1:8100/v1 python process_file.py paper.tex
+
+check_ratelimit.py starts it in-process with start().
+"""
+
+import argparse
+import hashlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import threading
+import time
+
+# Dimensions of the stub's embeddings
+EMBEDDING_DIMENSIONS = 16
+
+ANSWER = json.dumps({'answer': 'YES', 'section name': 'None', 'justification': 'Answered by the stub server.'})
+
+class StubState:
+    """
+    What the stub does and what it has seen, shared by the threads of one server.
+    """
+    def __init__(self, fail_first=0, retry_after=0.5, completion_tokens=20):
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.completion_tokens = completion_tokens
+        # (arrival time, path, model, status) of every request
+        self.log = []
+        self.lock = threading.Lock()
+
+    def arrived(self, path, model):
+        """
+        Logs a request and returns the status it is answered with.
+        """
+        with self.lock:
+            status = 429 if len(self.log) < self.fail_first else 200
+            self.log.append((time.monotonic(), path, model, status))
+        return status
+
+    def arrivals(self, status=200):
+        with self.lock:
+            return [arrived for arrived, _, _, answered in self.log if answered == status]
+
+def embedding(text):
+    digest = hashlib.sha256(str(text).encode()).digest()
+    return [byte / 255 for byte in digest[:EMBEDDING_DIMENSIONS]]
+
+def prompt_tokens(body):
+    # Same rough count as the client's estimate, close enough for a stub
+    return len(json.dumps(body.get('messages') or body.get('input') or '')) // 4 + 1
+
+class StubHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=()):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        model = body.get('model')
+        if self.state.arrived(self.path, model) == 429:
+            self.send_json(429, {'error': {'message': 'Rate limit reached (stub)', 'type': 'requests'}},
+                           [('Retry-After', f"{self.state.retry_after:g}")])
+            return
+
+        tokens = prompt_tokens(body)
+        if self.path.endswith('/embeddings'):
+            inputs = body.get('input')
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            self.send_json(200, {'object': 'list', 'model': model,
+                                 'data': [{'object': 'embedding', 'index': index, 'embedding': embedding(text)}
+                                          for index, text in enumerate(inputs)],
+                                 'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}})
+        elif self.path.endswith('/chat/completions'):
+            completion = self.state.completion_tokens
+            self.send_json(200, {'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                                 'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ANSWER},
+                                              'finish_reason': 'stop'}],
+                                 'usage': {'prompt_tokens': tokens, 'completion_tokens': completion,
+                                           'total_tokens': tokens + completion}})
+        else:
+            self.send_json(404, {'error': {'message': f"Unknown path {self.path} (stub)"}})
+
+def start(state=None, host='127.0.0.1', port=0):
+    """
+    Serves the stub on a background thread. Returns the server (server_address has the port) and its state.
+    """
+    state = state or StubState()
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a stub of the OpenAI API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--fail-first', type=int, default=0, help="Answer this many first requests with 429")
+    parser.add_argument('--retry-after', type=float, default=0.5, help="Retry-After seconds sent with a 429")
+    args = parser.parse_args()
+
+    server, state = start(StubState(args.fail_first, args.retry_after), args.host, args.port)
+    print(f"Stub OpenAI API on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory vector index of a single paper.
+"""
+
+import numpy as np
+from llama_index.core.schema import MetadataMode, NodeWithScore
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+class PaperIndex:
+    """
+    The embeddings of every chunk of a paper in one contiguous float32 matrix (one normalized row per chunk),
+    with the section each row belongs to. Each section is indexed whole as well as through its chunks.
+
+    All checklist queries are scored in one matrix multiply. A query gets the sections of its top_k chunks,
+    each section once with the score of its best chunk, best first (what RecursiveRetriever used to return
+    for the IndexNodes pointing at their parent section).
+    """
+    def __init__(self, sections, section_chunks, embed_model):
+        self.sections = list(sections)
+        texts = []
+        row_sections = []
+        for position, (section, chunks) in enumerate(zip(self.sections, section_chunks)):
+            for node in list(chunks) + [section]:
+                texts.append(node.get_content(metadata_mode=MetadataMode.EMBED))
+                row_sections.append(position)
+
+        embeddings = embed_model.get_text_embedding_batch(texts) if texts else []
+        self.matrix = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1))
+        self.row_sections = np.asarray(row_sections, dtype=np.int64)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def retrieve_many(self, query_embeddings, top_k):
+        """
+        Sections retrieved for each query embedding, as lists of NodeWithScore in the order of the queries.
+        """
+        if len(self) == 0 or len(query_embeddings) == 0:
+            return [[] for _ in query_embeddings]
+
+        queries = normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+        scores = queries @ self.matrix.T
+        k = min(top_k, len(self))
+        top_rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for query_scores, rows in zip(scores, top_rows):
+            rows = rows[np.argsort(-query_scores[rows], kind='stable')]
+            seen = set()
+            hits = []
+            for row in rows:
+                position = self.row_sections[row]
+                if position in seen:
+                    continue
+                seen.add(position)
+                hits.append(NodeWithScore(node=self.sections[position], score=float(query_scores[row])))
+            results.append(hits)
+        return results